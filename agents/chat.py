@@ -11,6 +11,8 @@ and real estate knowledge. Features:
 import logging
 import os
 import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from typing import Annotated
 
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
@@ -66,6 +68,14 @@ class ChatAgent:
         self._rag_manager = None
         self._facts_store = None
         self._conversation_memory = None
+        # Memory writes and fact extraction run off the response path. One
+        # worker keeps each user's extractions in order; pending work still
+        # finishes at interpreter exit.
+        self._memory_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-memory")
+        # Latest memory job per user. The user's next turn and memory clears
+        # wait for it, so they never act on facts it hasn't stored yet.
+        self._memory_jobs: dict[str, Future] = {}
+        self._memory_jobs_lock = threading.Lock()
         
         # Current context (set per-request for tool access)
         self._current_user_id: str | None = None
@@ -88,6 +98,10 @@ class ChatAgent:
         self._anonymous_tools = self._get_tools(anonymous=True)
         self._anonymous_graph = self._build_graph(tools=self._anonymous_tools)
         self._anonymous_compiled = self._anonymous_graph.compile()
+        
+        # Start loading the memory embedding model now, not on the first turn
+        if config.MEMORY_WARMUP:
+            _ = self.conversation_memory
     
     @property
     def llm(self) -> ChatOpenAI:
@@ -292,7 +306,7 @@ class ChatAgent:
         """
         Store the conversation exchange and extract any facts.
         
-        This is called after each successful response.
+        This is called after each successful response, on the memory executor.
         """
         # Store in conversation memory for recall
         if config.MEMORY_STORE_CONVERSATIONS and self.conversation_memory:
@@ -319,21 +333,44 @@ class ChatAgent:
                     existing_facts=existing_facts
                 )
                 
-                # Store facts that meet confidence threshold
-                for fact in extracted:
-                    confidence = fact.get("confidence", 0.0)
-                    if confidence >= config.MEMORY_FACT_MIN_CONFIDENCE:
-                        self.facts_store.set_fact(
-                            user_id=user_id,
-                            fact_type=fact["fact_type"],
-                            fact_value=fact["fact_value"],
-                            confidence=confidence,
-                            source_thread_id=thread_id
-                        )
-                        logger.info(f"Extracted fact for {user_id}: {fact['fact_type']}={fact['fact_value']}")
+                # Store facts that meet confidence threshold (one transaction)
+                confident = [
+                    fact for fact in extracted
+                    if fact.get("confidence", 0.0) >= config.MEMORY_FACT_MIN_CONFIDENCE
+                ]
+                self.facts_store.set_facts_bulk(user_id, confident, source_thread_id=thread_id)
+                for fact in confident:
+                    logger.info(f"Extracted fact for {user_id}: {fact['fact_type']}={fact['fact_value']}")
             except Exception as e:
                 logger.warning(f"Failed to extract facts: {e}")
     
+    def _submit_memory_job(self, user_id: str, **exchange) -> None:
+        """Store an exchange and extract facts for a user on the memory executor."""
+        future = self._memory_executor.submit(
+            self._store_exchange_and_extract_facts, user_id=user_id, **exchange
+        )
+        with self._memory_jobs_lock:
+            self._memory_jobs[user_id] = future
+        
+        def forget(done: Future) -> None:
+            with self._memory_jobs_lock:
+                if self._memory_jobs.get(user_id) is done:
+                    del self._memory_jobs[user_id]
+        
+        future.add_done_callback(forget)
+    
+    def _wait_for_memory_jobs(self, user_id: str) -> None:
+        """
+        Wait until the user's queued memory jobs have finished.
+        
+        Jobs run one at a time in submission order, so the latest one
+        finishing means all of them have.
+        """
+        with self._memory_jobs_lock:
+            future = self._memory_jobs.get(user_id)
+        if future is not None:
+            wait([future])
+    
     def _create_langfuse_handler(self, session_id: str, metadata: dict):
         """
         Create LangFuse callback handler if enabled.
@@ -408,6 +445,9 @@ class ChatAgent:
         self._current_user_id = self._extract_user_id(thread_id)
         self._current_thread_id = thread_id
         
+        # Facts from the previous turn feed this turn's system prompt
+        self._wait_for_memory_jobs(self._current_user_id)
+        
         invoke_config = {"configurable": {"thread_id": thread_id}}
         
         handler = self._create_langfuse_handler(
@@ -425,9 +465,10 @@ class ChatAgent:
         
             response_text = self._extract_response_text(result)
             
-            # Store exchange and extract facts for authenticated users
+            # Store exchange and extract facts for authenticated users, in the
+            # background so the response isn't held up by the extraction LLM call
             if not result.get("input_blocked"):
-                self._store_exchange_and_extract_facts(
+                self._submit_memory_job(
                     user_id=self._current_user_id,
                     thread_id=thread_id,
                     user_message=message,
@@ -563,6 +604,10 @@ class ChatAgent:
         """
         result = {"facts_cleared": 0, "conversations_cleared": 0}
         
+        # Let queued jobs finish first, so they can't store facts again
+        # after the clear
+        self._wait_for_memory_jobs(user_id)
+        
         if self.facts_store:
             result["facts_cleared"] = self.facts_store.clear_user(user_id)
         
@@ -2,6 +2,8 @@
 """
 Document Classifier agent for mortgage document categorization.
 """
+from collections import Counter, defaultdict
+
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableConfig
 
@@ -69,29 +71,24 @@ class ClassifierAgent(BaseAgent):
     
     def build_classification_summary(self, classified_docs: list[ClassifiedDocument]) -> dict:
         """Build a summary of classifications by category."""
-        summary: dict = {}
+        counts: Counter = Counter()
+        documents: defaultdict = defaultdict(list)
+        confidence_sums: defaultdict = defaultdict(float)
         
         for doc in classified_docs:
             category = doc.category
-            if category not in summary:
-                summary[category] = {
-                    "count": 0,
-                    "documents": [],
-                    "total_confidence": 0.0
-                }
-            
-            summary[category]["count"] += 1
-            summary[category]["documents"].append(doc.document.file_name)
-            summary[category]["total_confidence"] += doc.confidence
-        
-        for category in summary:
-            count = summary[category]["count"]
-            summary[category]["avg_confidence"] = round(
-                summary[category]["total_confidence"] / count, 2
-            )
-            del summary[category]["total_confidence"]
-        
-        return summary
+            counts[category] += 1
+            documents[category].append(doc.document.file_name)
+            confidence_sums[category] += doc.confidence
+        
+        return {
+            category: {
+                "count": count,
+                "documents": documents[category],
+                "avg_confidence": round(confidence_sums[category] / count, 2),
+            }
+            for category, count in counts.items()
+        }
     
     def run(self, state: WorkflowState, config: RunnableConfig) -> dict:
         """Classify all extracted documents."""
@@ -12,7 +12,7 @@ from config import config as app_config
 from models import ExtractedDocument, ExtractionResult, WorkflowError, WorkflowState
 from prompts import EXTRACTION_SYSTEM_PROMPT, EXTRACTION_USER_PROMPT
 from utils.document_cache import document_cache
-from utils.pdf import extract_text_from_pdf
+from utils.pdf import PDFExtractionResult, extract_text_from_pdf, extract_text_from_pdfs
 
 
 class PDFExtractorAgent(BaseAgent):
@@ -37,6 +37,29 @@ class PDFExtractorAgent(BaseAgent):
             config=config
         )
     
+    def _extract_texts(self, pdf_paths: list[Path]) -> list[PDFExtractionResult | Exception]:
+        """
+        Extract text from PDFs together, so OCR batches pages across documents.
+        
+        If the batch fails, each PDF is retried on its own and a failure is
+        returned in place of that document's result.
+        """
+        if not pdf_paths:
+            return []
+        
+        try:
+            return extract_text_from_pdfs(pdf_paths, include_page_markers=True)
+        except Exception as e:
+            self.log(f"Batch extraction failed, retrying per document: {e}")
+        
+        results = []
+        for pdf_path in pdf_paths:
+            try:
+                results.append(extract_text_from_pdf(pdf_path, include_page_markers=True))
+            except Exception as e:
+                results.append(e)
+        return results
+    
     def run(self, state: WorkflowState, config: RunnableConfig) -> dict:
         """Extract content from all PDF files in the input directory."""
         print("\n" + "="*60)
@@ -79,6 +102,8 @@ class PDFExtractorAgent(BaseAgent):
         print(f"LLM URL: {app_config.OPENAI_BASE_URL}")
         print(f"LLM MODEL: {app_config.OPENAI_MODEL}")
 
+        # Serve cache hits first; the remaining PDFs are extracted together
+        pending: list[tuple[Path, str]] = []
         for pdf_path in pdf_files:
             self.log(f"Processing: {pdf_path.name}")
             
@@ -96,8 +121,20 @@ class PDFExtractorAgent(BaseAgent):
                     self.log(f"  [CACHE HIT] Using cached extraction")
                     continue
                 
-                # Use shared PDF extraction utility
-                extraction = extract_text_from_pdf(pdf_path, include_page_markers=True)
+                pending.append((pdf_path, content_hash))
+            
+            except Exception as e:
+                errors.append(self._extraction_error(pdf_path, e))
+                self.log(f"  [ERROR] {e}")
+        
+        extractions = self._extract_texts([pdf_path for pdf_path, _ in pending])
+        
+        for (pdf_path, content_hash), extraction in zip(pending, extractions):
+            self.log(f"Analyzing: {pdf_path.name}")
+            
+            try:
+                if isinstance(extraction, Exception):
+                    raise extraction
                 
                 if extraction.ocr_used:
                     self.log(f"  OCR used (confidence: {extraction.ocr_confidence:.0%})")
@@ -141,27 +178,8 @@ class PDFExtractorAgent(BaseAgent):
                     document_cache.store_extraction(content_hash, pdf_path.name, doc)
                 self.log(f"  Extracted {extraction.page_count} pages, {len(result.entities)} entities")
                 
-            except RuntimeError as e:
-                errors.append(WorkflowError(
-                    code="PDF_EXTRACTION_FAILED",
-                    message=str(e),
-                    severity="error",
-                    recoverable=False,
-                    node="extractor",
-                    document=pdf_path.name,
-                ))
-                self.log(f"  [ERROR] {e}")
-                
             except Exception as e:
-                errors.append(WorkflowError(
-                    code="EXTRACTION_UNEXPECTED_ERROR",
-                    message=str(e),
-                    severity="error",
-                    recoverable=False,
-                    node="extractor",
-                    document=pdf_path.name,
-                    details={"error_type": type(e).__name__},
-                ))
+                errors.append(self._extraction_error(pdf_path, e))
                 self.log(f"  [ERROR] {e}")
         
         self.log(f"Extraction complete: {len(extracted_docs)} successful, {cache_hits} from cache, {len(errors)} errors")
@@ -172,3 +190,25 @@ class PDFExtractorAgent(BaseAgent):
             "extraction_errors": errors,
             "messages": [f"Extracted {len(extracted_docs)} documents with {len(errors)} errors"]
         }
+    
+    @staticmethod
+    def _extraction_error(pdf_path: Path, error: Exception) -> WorkflowError:
+        """Build the workflow error for a PDF that failed extraction."""
+        if isinstance(error, RuntimeError):
+            return WorkflowError(
+                code="PDF_EXTRACTION_FAILED",
+                message=str(error),
+                severity="error",
+                recoverable=False,
+                node="extractor",
+                document=pdf_path.name,
+            )
+        return WorkflowError(
+            code="EXTRACTION_UNEXPECTED_ERROR",
+            message=str(error),
+            severity="error",
+            recoverable=False,
+            node="extractor",
+            document=pdf_path.name,
+            details={"error_type": type(error).__name__},
+        )
@@ -38,6 +38,15 @@ class Config:
     # Maximum characters of sample text for classification
     CLASSIFICATION_SAMPLE_CHARS: int = int(os.getenv("CLASSIFICATION_SAMPLE_CHARS", "2000"))
     
+    # ==========================================================================
+    # PDF Extraction Settings
+    # ==========================================================================
+    # Maximum worker processes for per-page text extraction (1 = in-process)
+    PDF_MAX_WORKERS: int = int(os.getenv("PDF_MAX_WORKERS", "4"))
+    
+    # Keep the PDF's document info (author, title, dates) in extraction results
+    PDF_KEEP_METADATA: bool = os.getenv("PDF_KEEP_METADATA", "true").lower() in ("true", "1", "yes")
+    
     # ==========================================================================
     # OCR Settings (for scanned PDFs)
     # ==========================================================================
@@ -50,6 +59,15 @@ class Config:
     # Minimum free VRAM (GB) required to use GPU for OCR
     OCR_MIN_FREE_VRAM_GB: float = float(os.getenv("OCR_MIN_FREE_VRAM_GB", "3.0"))
     
+    # Pages per OCR predictor batch (0 = auto: 16 on GPU, 4 on CPU)
+    OCR_BATCH_SIZE: int = int(os.getenv("OCR_BATCH_SIZE", "0"))
+    
+    # Run GPU OCR under FP16 autocast (ignored on CPU)
+    OCR_USE_FP16: bool = os.getenv("OCR_USE_FP16", "true").lower() in ("true", "1", "yes")
+    
+    # Compile GPU OCR models with torch.compile (slow first batch, faster after)
+    OCR_COMPILE: bool = os.getenv("OCR_COMPILE", "false").lower() in ("true", "1", "yes")
+    
     # ==========================================================================
     # Directory Paths and Storage
     # ==========================================================================
@@ -65,10 +83,23 @@ class Config:
     # ==========================================================================
     KNOWLEDGE_BASE_DIR: Path = Path(os.getenv("KNOWLEDGE_BASE_DIR", "./knowledge_base"))
     CHROMA_DB_PATH: str = _resolve_db_path("CHROMA_DB_PATH", ".chroma_db", BASE_DIR)
+    # Chroma server to use instead of the local CHROMA_DB_PATH (e.g. `chroma run --path <dir>`)
+    CHROMA_HOST: str = os.getenv("CHROMA_HOST", "")
+    CHROMA_PORT: int = int(os.getenv("CHROMA_PORT", "8000"))
     RAG_EMBEDDING_MODEL: str = os.getenv("RAG_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    # Embedding model weights dtype: float32, bfloat16 (CPUs with AVX-512 BF16/AMX) or float16
+    RAG_EMBEDDING_DTYPE: str = os.getenv("RAG_EMBEDDING_DTYPE", "float32")
+    # Optional ONNX export of the embedding model to run on CPU instead of torch, e.g. a
+    # dynamically quantized int8 file such as "onnx/model_qint8_avx512.onnx" (needs optimum, see requirements-optional.txt)
+    RAG_EMBEDDING_ONNX_FILE: str = os.getenv("RAG_EMBEDDING_ONNX_FILE", "")
     RAG_CHUNK_SIZE: int = int(os.getenv("RAG_CHUNK_SIZE", "1000"))
     RAG_CHUNK_OVERLAP: int = int(os.getenv("RAG_CHUNK_OVERLAP", "200"))
     RAG_TOP_K: int = int(os.getenv("RAG_TOP_K", "4"))
+    RAG_EMBED_BATCH: int = int(os.getenv("RAG_EMBED_BATCH", "256"))  # Chunks per embedding call during ingestion
+    # Diversify retrieved context with maximal marginal relevance
+    RAG_USE_MMR: bool = os.getenv("RAG_USE_MMR", "false").lower() in ("true", "1", "yes")
+    RAG_MMR_FETCH_MULTIPLIER: int = int(os.getenv("RAG_MMR_FETCH_MULTIPLIER", "4"))
+    RAG_MMR_LAMBDA: float = float(os.getenv("RAG_MMR_LAMBDA", "0.5"))  # 1 = relevance only, 0 = diversity only
     
     # ==========================================================================
     # Chat Settings
@@ -86,6 +117,19 @@ class Config:
     # Conversation memory settings
     MEMORY_STORE_CONVERSATIONS: bool = os.getenv("MEMORY_STORE_CONVERSATIONS", "true").lower() in ("true", "1", "yes")
     MEMORY_RECALL_TOP_K: int = int(os.getenv("MEMORY_RECALL_TOP_K", "3"))
+    # Load the embedding model in a background thread at startup instead of on the first chat turn
+    MEMORY_WARMUP: bool = os.getenv("MEMORY_WARMUP", "true").lower() in ("true", "1", "yes")
+    # Exchanges are buffered and written to ChromaDB in batches of this size,
+    # or after this many seconds, whichever comes first
+    MEMORY_FLUSH_SIZE: int = int(os.getenv("MEMORY_FLUSH_SIZE", "100"))
+    MEMORY_FLUSH_INTERVAL: float = float(os.getenv("MEMORY_FLUSH_INTERVAL", "5.0"))
+    # Device for the memory embedding model: auto (cuda, then mps, then cpu), cuda, mps or cpu
+    MEMORY_EMBEDDING_DEVICE: str = os.getenv("MEMORY_EMBEDDING_DEVICE", "auto")
+    # Skip storing an exchange whose embedding is at least this cosine-similar
+    # to one of the user's recent exchanges (above 1.0 disables the check)
+    MEMORY_DEDUP_SIMILARITY: float = float(os.getenv("MEMORY_DEDUP_SIMILARITY", "0.97"))
+    # Keep at most this many stored exchanges per user, pruning the oldest (0 = unlimited)
+    MEMORY_MAX_EXCHANGES_PER_USER: int = int(os.getenv("MEMORY_MAX_EXCHANGES_PER_USER", "500"))
     
     # ==========================================================================
     # BatchData.io API (Property Data)
@@ -2,7 +2,7 @@
 from .report_generator import generate_report, generate_report_from_state
 from .human_review import review_unknown_documents, collect_human_review_cli
 from .document_cache import document_cache, DocumentCache
-from .ocr import ocr_pdf, needs_ocr
+from .ocr import ocr_pdf, ocr_pdfs_batch, needs_ocr
 
 __all__ = [
     "generate_report", 
@@ -12,5 +12,6 @@ __all__ = [
     "document_cache",
     "DocumentCache",
     "ocr_pdf",
+    "ocr_pdfs_batch",
     "needs_ocr",
 ]
@@ -0,0 +1,38 @@
+# This project was developed with assistance from AI tools.
+"""
+Client setup for ChromaDB (knowledge base and conversation memory).
+
+By default Chroma runs in-process on a local directory. Setting CHROMA_HOST
+points every store at a Chroma server instead (e.g. a `chroma run --path <dir>`
+sidecar), so several app processes can share one index concurrently.
+"""
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from config import config
+
+if TYPE_CHECKING:
+    import chromadb
+    from chromadb.config import Settings
+
+
+def connect_chroma(persist_directory: str | Path, settings: "Settings | None" = None) -> "chromadb.ClientAPI":
+    """
+    Open a Chroma client: HTTP when CHROMA_HOST is set, else persistent on disk.
+
+    Args:
+        persist_directory: Local storage directory (unused for the HTTP client)
+        settings: Optional client settings
+
+    Returns:
+        Chroma client
+    """
+    import chromadb
+    from chromadb.config import Settings
+
+    settings = settings or Settings()
+    if config.CHROMA_HOST:
+        return chromadb.HttpClient(host=config.CHROMA_HOST, port=config.CHROMA_PORT, settings=settings)
+
+    Path(persist_directory).mkdir(parents=True, exist_ok=True)
+    return chromadb.PersistentClient(path=str(persist_directory), settings=settings)
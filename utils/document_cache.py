@@ -50,6 +50,15 @@ class DocumentCache:
                 CREATE INDEX IF NOT EXISTS idx_file_name 
                 ON document_cache(file_name)
             """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pdf_text_cache (
+                    content_hash TEXT,
+                    settings TEXT,
+                    result_data TEXT,
+                    created_at TEXT,
+                    PRIMARY KEY (content_hash, settings)
+                )
+            """)
             conn.commit()
     
     @staticmethod
@@ -189,6 +198,43 @@ class DocumentCache:
             """, (classification.model_dump_json(), now, content_hash))
             conn.commit()
     
+    def get_pdf_text(self, content_hash: str, settings: str) -> Optional[dict]:
+        """
+        Retrieve a cached PDF text extraction (text layer and any OCR).
+        
+        Args:
+            content_hash: SHA256 hash of the PDF
+            settings: Extraction settings the text was produced with
+        
+        Returns:
+            Dict of PDFExtractionResult fields if cached, None otherwise
+        """
+        with sqlite3.connect(self.cache_path) as conn:
+            cursor = conn.execute(
+                """SELECT result_data FROM pdf_text_cache
+                   WHERE content_hash = ? AND settings = ?""",
+                (content_hash, settings)
+            )
+            row = cursor.fetchone()
+        
+        return json.loads(row[0]) if row else None
+    
+    def store_pdf_text(self, content_hash: str, settings: str, result: dict) -> None:
+        """
+        Store a PDF text extraction in cache.
+        
+        Args:
+            content_hash: SHA256 hash of the PDF
+            settings: Extraction settings the text was produced with
+            result: PDFExtractionResult fields to cache
+        """
+        with sqlite3.connect(self.cache_path) as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO pdf_text_cache (content_hash, settings, result_data, created_at)
+                VALUES (?, ?, ?, ?)
+            """, (content_hash, settings, json.dumps(result), datetime.now().isoformat()))
+            conn.commit()
+    
     def get_stats(self) -> dict:
         """
         Get cache statistics.
@@ -209,11 +255,15 @@ class DocumentCache:
                 "SELECT COUNT(*) FROM document_cache WHERE classification_data IS NOT NULL"
             )
             with_classification = cursor.fetchone()[0]
+            
+            cursor = conn.execute("SELECT COUNT(*) FROM pdf_text_cache")
+            pdf_texts = cursor.fetchone()[0]
         
         return {
             "total_documents": total,
             "with_extraction": with_extraction,
-            "with_classification": with_classification
+            "with_classification": with_classification,
+            "pdf_texts": pdf_texts,
         }
     
     def clear(self) -> int:
@@ -227,6 +277,7 @@ class DocumentCache:
             cursor = conn.execute("SELECT COUNT(*) FROM document_cache")
             count = cursor.fetchone()[0]
             conn.execute("DELETE FROM document_cache")
+            conn.execute("DELETE FROM pdf_text_cache")
             conn.commit()
         return count
 
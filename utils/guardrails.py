@@ -8,16 +8,36 @@ Implements a layered approach:
 
 Layer 2 (Intent Evaluation) is handled separately if enabled.
 """
+import functools
+import hashlib
 import html
+from array import array
 import logging
 import re
-from dataclasses import dataclass, field
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
 from enum import Enum
-from typing import Any
+from typing import Any, Iterable, NamedTuple
 
 from config import config
 from prompts import GUARDRAIL_INTENT_PROMPT
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
 logger = logging.getLogger(__name__)
 
 
@@ -40,6 +60,26 @@ class PIIMatch:
     text: str  # The matched text (for logging, not for display)
 
 
+class PIISpans(NamedTuple):
+    """Detected PII as parallel arrays (cheaper than one PIIMatch per hit)."""
+    entity_types: list[str]
+    starts: array
+    ends: array
+
+
+@dataclass(slots=True)
+class GuardrailCtx:
+    """Text passed between guardrail stages, with derived forms computed once."""
+    text: str
+    text_lower: str
+    length: int
+    
+    @classmethod
+    def from_text(cls, text: str) -> "GuardrailCtx":
+        """Build a context for text."""
+        return cls(text=text, text_lower=text.lower(), length=len(text))
+
+
 @dataclass
 class GuardrailResult:
     """Result of guardrail check."""
@@ -49,6 +89,193 @@ class GuardrailResult:
     blocked_details: str | None = None
     pii_detected: list[PIIMatch] = field(default_factory=list)
     warnings: list[str] = field(default_factory=list)
+    
+    def copy(self) -> "GuardrailResult":
+        """Return a copy with its own match and warning lists."""
+        return replace(self, pii_detected=list(self.pii_detected), warnings=list(self.warnings))
+
+
+class _ResultCache:
+    """
+    Bounded LRU of guardrail results, keyed on a digest of the checked input.
+    
+    Only the digest is kept, never the input itself, and results that found
+    PII aren't cached, so no user PII outlives the request that carried it.
+    """
+    
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[bytes, GuardrailResult] = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(*parts: Any) -> bytes:
+        """Digest the check's input text and flags (length-prefixed, so parts can't run together)."""
+        digest = hashlib.blake2b(digest_size=16)
+        for part in parts:
+            data = part.encode("utf-8", "surrogatepass") if isinstance(part, str) else repr(part).encode()
+            digest.update(len(data).to_bytes(8, "little"))
+            digest.update(data)
+        return digest.digest()
+    
+    def get(self, key: bytes) -> GuardrailResult | None:
+        """Return a copy of the cached result, or None."""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                return None
+            self._entries.move_to_end(key)
+        return result.copy()
+    
+    def put(self, key: bytes, result: GuardrailResult) -> None:
+        """Cache a result unless it carries detected PII."""
+        if result.pii_detected:
+            return
+        with self._lock:
+            self._entries[key] = result.copy()
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class _KeywordMatcher:
+    """
+    Find any of a fixed set of keywords in text with a single scan.
+    
+    Uses an Aho-Corasick automaton (pyahocorasick) when installed, else one
+    RE2 alternation (google-re2, linear-time DFA), else one substring scan
+    per keyword.
+    """
+    
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = tuple(keywords)
+        self._automaton = None
+        self._regex = None
+        if not self.keywords:
+            return
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+        elif re2 is not None:
+            # Longest first, so the reported keyword matches the substring scan
+            # when one keyword is a prefix of another
+            ordered = sorted(self.keywords, key=len, reverse=True)
+            self._regex = re2.compile("|".join(re.escape(k) for k in ordered))
+    
+    def find(self, text: str) -> str | None:
+        """Return the first keyword found in text, or None."""
+        if self._automaton is not None:
+            hit = next(self._automaton.iter(text), None)
+            return hit[1] if hit else None
+        if self._regex is not None:
+            match = self._regex.search(text)
+            return match.group() if match else None
+        return next((keyword for keyword in self.keywords if keyword in text), None)
+
+
+class _Prefilter:
+    """
+    Hyperscan database answering "can any of these patterns match?" in one pass.
+    
+    Used to skip the exact `re` scans on the common no-match path. Hyperscan
+    reports matches differently from `re` (all overlapping matches, byte
+    offsets), so spans always come from `re`; a hit only means "run `re`".
+    Non-ASCII text is always passed through, since character classes like
+    \\d and \\w are Unicode-aware in `re` but not in Hyperscan.
+    """
+    
+    def __init__(self, patterns: Iterable[str], caseless: bool = False, dotall: bool = False):
+        """Compile patterns into a single block-mode database."""
+        patterns = [_hyperscan_pattern(pattern) for pattern in patterns]
+        flags = hyperscan.HS_FLAG_SINGLEMATCH
+        if caseless:
+            flags |= hyperscan.HS_FLAG_CASELESS
+        if dotall:
+            flags |= hyperscan.HS_FLAG_DOTALL
+        self._db = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+        self._db.compile(
+            expressions=patterns,
+            ids=list(range(len(patterns))),
+            elements=len(patterns),
+            flags=[flags] * len(patterns),
+        )
+        # Scratch space can't be shared between concurrent scans
+        self._local = threading.local()
+    
+    def may_match(self, text: str) -> bool:
+        """Return False only if none of the patterns can match text."""
+        if not text.isascii():
+            return True
+        
+        scratch = getattr(self._local, "scratch", None)
+        if scratch is None:
+            scratch = self._local.scratch = hyperscan.Scratch(self._db)
+        
+        try:
+            self._db.scan(text.encode("ascii"), match_event_handler=_stop_scan, scratch=scratch)
+        except hyperscan.ScanTerminated:
+            return True
+        return False
+
+
+def _stop_scan(*_) -> bool:
+    """Hyperscan match handler that stops at the first match."""
+    return True
+
+
+def _hyperscan_pattern(pattern: str) -> bytes:
+    """
+    Translate a Python regex for Hyperscan on ASCII text.
+    
+    Python's \\s also matches the separators \\x1c-\\x1f; Hyperscan's doesn't.
+    """
+    parts = []
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        if pattern[i] == "\\":
+            escape = pattern[i:i + 2]
+            if escape == r"\s":
+                escape = r"\s\x1c-\x1f" if in_class else r"[\s\x1c-\x1f]"
+            parts.append(escape)
+            i += 2
+            continue
+        if pattern[i] == "[":
+            in_class = True
+        elif pattern[i] == "]":
+            in_class = False
+        parts.append(pattern[i])
+        i += 1
+    return "".join(parts).encode("ascii")
+
+
+def _build_prefilter(patterns: Iterable[str], **kwargs) -> _Prefilter | None:
+    """Build a Hyperscan prefilter, or None if unavailable."""
+    if hyperscan is None:
+        return None
+    try:
+        return _Prefilter(patterns, **kwargs)
+    except hyperscan.HyperscanError as e:
+        logger.debug(f"Hyperscan prefilter unavailable: {e}")
+        return None
+
+
+@functools.lru_cache(maxsize=32)
+def _system_prompt_chunks(system_prompt: str, chunk_size: int = 100, step: int = 50):
+    """
+    Split a system prompt into overlapping chunks for leak detection.
+    
+    Cached per prompt, since the same prompt is checked against every response.
+    
+    Returns:
+        _KeywordMatcher over the chunks
+    """
+    return _KeywordMatcher({
+        system_prompt[i:i + chunk_size]
+        for i in range(0, len(system_prompt) - chunk_size, step)
+    })
 
 
 class InputSanitizer:
@@ -84,7 +311,40 @@ class InputSanitizer:
     MARKDOWN_INJECTION = re.compile(r'```[\s\S]*?```|`[^`]+`')
     
     # Excessive repeated characters (potential DoS)
-    EXCESSIVE_REPEATS = re.compile(r'(.)\1{50,}')
+    EXCESSIVE_REPEATS = re.compile(r'(?P<repeat_char>.)(?P=repeat_char){50,}')
+    
+    # Every script-like pattern contains at least one of these characters
+    SCRIPT_TRIGGERS = ('<', ':', '=')
+    
+    # Invisible and control characters, stripped in one pass before any other
+    # check so they can't be used to split up patterns (e.g. "java\u200bscript:")
+    STRIP_CHARS = re.compile(
+        rf'(?P<invisible>{INVISIBLE_CHARS.pattern})|{CONTROL_CHARS.pattern}'
+    )
+    
+    # Whitespace runs and any single non-space whitespace character, collapsed
+    # to one space (same result as ' '.join(text.split()) after stripping)
+    WHITESPACE = re.compile(r'\s{2,}|[^\S ]')
+    
+    # Warning for each kind of change, in reporting order
+    WARNINGS = {
+        "invisible": "Removed invisible characters",
+        "html": "Escaped HTML tags",
+        "script": "Removed script-like content",
+        "repeat": "Truncated excessive repeated characters",
+    }
+    
+    def __init__(self):
+        """Build the optional Hyperscan prefilter for script-like patterns."""
+        self._script_prefilter = _build_prefilter(
+            [self.SCRIPT_PATTERNS.pattern], caseless=True, dotall=True
+        )
+    
+    def _may_contain_script(self, text: str) -> bool:
+        """Cheap check for whether any script-like pattern can match."""
+        if not any(char in text for char in self.SCRIPT_TRIGGERS):
+            return False
+        return self._script_prefilter is None or self._script_prefilter.may_match(text)
     
     def sanitize(self, text: str) -> tuple[str, list[str]]:
         """
@@ -93,43 +353,61 @@ class InputSanitizer:
         Returns:
             Tuple of (sanitized_text, list of warnings)
         """
-        warnings = []
-        original_length = len(text)
+        found = set()
+        
+        def strip_char(match: re.Match) -> str:
+            if match.lastgroup:
+                found.add(match.lastgroup)
+            return ''
         
-        # Remove invisible characters
-        text = self.INVISIBLE_CHARS.sub('', text)
-        if len(text) < original_length:
-            warnings.append("Removed invisible characters")
+        def remove_script(match: re.Match) -> str:
+            found.add("script")
+            return '[removed]'
         
-        # Remove control characters
-        text = self.CONTROL_CHARS.sub('', text)
+        def truncate_repeat(match: re.Match) -> str:
+            found.add("repeat")
+            return match.group("repeat_char") * 10 + '...'
+        
+        # Remove invisible and control characters
+        text = self.STRIP_CHARS.sub(strip_char, text)
         
         # Escape HTML entities (don't remove, escape for safety)
-        if self.HTML_TAGS.search(text):
+        if '<' in text and self.HTML_TAGS.search(text):
             text = html.escape(text)
-            warnings.append("Escaped HTML tags")
+            found.add("html")
         
-        # Remove script-like patterns
-        if self.SCRIPT_PATTERNS.search(text):
-            text = self.SCRIPT_PATTERNS.sub('[removed]', text)
-            warnings.append("Removed script-like content")
+        # Remove script-like patterns, only scanning when one may be present.
+        # This must finish before repeats are truncated: a long run can end in
+        # a pattern (e.g. "jjj...javascript:"), which one combined alternation
+        # would truncate first and so never remove.
+        if self._may_contain_script(text):
+            text = self.SCRIPT_PATTERNS.sub(remove_script, text)
         
-        # Truncate excessive repeats
-        if self.EXCESSIVE_REPEATS.search(text):
-            text = self.EXCESSIVE_REPEATS.sub(r'\1' * 10 + '...', text)
-            warnings.append("Truncated excessive repeated characters")
+        # Truncate excessive repeats (a run needs more than 50 characters)
+        if len(text) > 50:
+            text = self.EXCESSIVE_REPEATS.sub(truncate_repeat, text)
         
         # Normalize whitespace
-        text = ' '.join(text.split())
+        text = self.WHITESPACE.sub(' ', text).strip()
         
-        return text.strip(), warnings
+        warnings = [message for kind, message in self.WARNINGS.items() if kind in found]
+        return text, warnings
 
 
 class PIIDetector:
     """
     Detect and optionally mask Personally Identifiable Information using regex patterns.
+    
+    All patterns are combined into a single alternation with one named group
+    per entity type, so text without PII is scanned once regardless of
+    pattern count. An alternation reports only one match per position, while
+    matches of different types can overlap (e.g. the digits of a phone
+    number used as an email address), so text it finds anything in is
+    scanned per type as well.
     """
     
+    # Per-entity patterns; the combined pattern built in __init__ only
+    # decides whether they need to run
     PATTERNS = {
         "SSN": re.compile(r'\b\d{3}-\d{2}-\d{4}\b'),
         "SSN_NO_DASH": re.compile(r'\b\d{9}\b'),
@@ -148,35 +426,127 @@ class PIIDetector:
         "IP_ADDRESS": "[REDACTED_IP]",
     }
     
-    def detect(self, text: str) -> list[PIIMatch]:
-        """Detect PII in text using regex patterns."""
-        matches = []
-        for entity_type, pattern in self.PATTERNS.items():
-            for match in pattern.finditer(text):
-                matches.append(PIIMatch(
-                    entity_type=entity_type,
-                    start=match.start(),
-                    end=match.end(),
-                    score=1.0,
-                    text=match.group()
-                ))
-        return matches
+    # Shortest text any pattern can match (an email like "a@b.cc")
+    MIN_MATCH_LENGTH = 6
+    
+    def __init__(self):
+        """Build the combined PII pattern and optional Hyperscan prefilter."""
+        self._combined = re.compile("|".join(
+            f"(?P<{entity_type}>{pattern.pattern})"
+            for entity_type, pattern in self.PATTERNS.items()
+        ))
+        self._prefilter = _build_prefilter(
+            pattern.pattern for pattern in self.PATTERNS.values()
+        )
+    
+    def _may_contain_pii(self, text: str) -> bool:
+        """Cheap check for whether any PII pattern can match."""
+        return self._prefilter is None or self._prefilter.may_match(text)
+    
+    @staticmethod
+    def _is_pii(entity_type: str, value: str) -> bool:
+        """
+        Reject matches that can't be PII.
+        
+        Any 9-digit number matches SSN_NO_DASH (account, routing and reference
+        numbers are common in financial documents), so those hits must also
+        satisfy SSA assignment rules: area not 000, 666 or 9xx, group not 00,
+        serial not 0000.
+        """
+        if entity_type != "SSN_NO_DASH":
+            return True
+        area, group, serial = value[:3], value[3:5], value[5:]
+        return (
+            area not in ("000", "666") and not area.startswith("9")
+            and group != "00" and serial != "0000"
+        )
+    
+    def detect_spans(self, text: str | GuardrailCtx) -> PIISpans:
+        """
+        Detect PII in text, sorted by start (longest first on ties).
+        
+        Spans of different entity types may overlap.
+        """
+        if isinstance(text, GuardrailCtx):
+            text, length = text.text, text.length
+        else:
+            length = len(text)
+        spans = PIISpans([], array("i"), array("i"))
+        if length < self.MIN_MATCH_LENGTH or not self._may_contain_pii(text):
+            return spans
+        if self._combined.search(text) is None:
+            return spans
+        
+        found = [
+            (match.start(), -match.end(), entity_type)
+            for entity_type, pattern in self.PATTERNS.items()
+            for match in pattern.finditer(text)
+            if self._is_pii(entity_type, match.group())
+        ]
+        for start, negative_end, entity_type in sorted(found):
+            spans.entity_types.append(entity_type)
+            spans.starts.append(start)
+            spans.ends.append(-negative_end)
+        return spans
+    
+    def detect(self, text: str | GuardrailCtx) -> list[PIIMatch]:
+        """Detect PII in text (or a GuardrailCtx built from it)."""
+        spans = self.detect_spans(text)
+        if isinstance(text, GuardrailCtx):
+            text = text.text
+        return self.to_matches(text, spans)
+    
+    @staticmethod
+    def to_matches(text: str, spans: PIISpans) -> list[PIIMatch]:
+        """Materialize PIIMatch objects from spans detected in text."""
+        return [
+            PIIMatch(
+                entity_type=entity_type,
+                start=start,
+                end=end,
+                score=1.0,
+                text=text[start:end]
+            )
+            for entity_type, start, end in zip(*spans)
+        ]
     
     def mask(self, text: str, pii_matches: list[PIIMatch] | None = None) -> str:
         """Mask detected PII in text."""
-        if pii_matches is None:
-            pii_matches = self.detect(text)
+        if pii_matches is not None:
+            return self.mask_with_matches(text, pii_matches)
         
-        if not pii_matches:
+        return self.mask_spans(text, self.detect_spans(text))
+    
+    def mask_with_matches(self, text: str, pii_matches: list[PIIMatch]) -> str:
+        """Mask previously detected PII in text, building the result in one pass."""
+        spans = PIISpans([], array("i"), array("i"))
+        for match in sorted(pii_matches, key=lambda m: (m.start, -m.end)):
+            spans.entity_types.append(match.entity_type)
+            spans.starts.append(match.start)
+            spans.ends.append(match.end)
+        return self.mask_spans(text, spans)
+    
+    def mask_spans(self, text: str, spans: PIISpans) -> str:
+        """
+        Mask PII at spans sorted by start (as from detect_spans).
+        
+        Overlapping spans are masked as one, with the first span's mask.
+        """
+        if not spans.entity_types:
             return text
         
-        sorted_matches = sorted(pii_matches, key=lambda m: m.start, reverse=True)
-        result = text
-        for match in sorted_matches:
-            mask = self.MASKS.get(match.entity_type, "[REDACTED]")
-            result = result[:match.start] + mask + result[match.end:]
+        parts = []
+        position = 0
+        for entity_type, start, end in zip(*spans):
+            if start < position:
+                position = max(position, end)
+                continue
+            parts.append(text[position:start])
+            parts.append(self.MASKS.get(entity_type, "[REDACTED]"))
+            position = end
+        parts.append(text[position:])
         
-        return result
+        return "".join(parts)
 
 
 class DomainClassifier:
@@ -220,28 +590,41 @@ class DomainClassifier:
         "write code", "program", "script", "sql query",
     }
     
-    def classify(self, text: str) -> tuple[bool, str | None]:
+    def __init__(self):
+        """Build the keyword matchers."""
+        self._flagged_matcher = _KeywordMatcher(self.FLAGGED_TOPICS)
+        self._ontopic_matcher = _KeywordMatcher(self.ON_TOPIC_KEYWORDS)
+        # Single-word keywords, matched against whole words with a set probe
+        self._ontopic_words = frozenset(
+            keyword for keyword in self.ON_TOPIC_KEYWORDS if " " not in keyword
+        )
+    
+    def classify(self, ctx: GuardrailCtx) -> tuple[bool, str | None]:
         """
         Classify if the text is within allowed domain.
         
+        Args:
+            ctx: Context holding the text and its lowercased form
+        
         Returns:
             Tuple of (is_allowed, reason_if_flagged)
         """
-        text_lower = text.lower()
-        
-        # Check for flagged topics first
-        for topic in self.FLAGGED_TOPICS:
-            if topic in text_lower:
-                # Don't block, but flag for potential review
-                return True, f"Flagged topic detected: {topic}"
-        
-        # Check if on-topic (any keyword match)
-        for keyword in self.ON_TOPIC_KEYWORDS:
-            if keyword in text_lower:
-                return True, None
+        # Check for flagged topics first (short messages can be flagged too)
+        topic = self._flagged_matcher.find(ctx.text_lower)
+        if topic:
+            # Don't block, but flag for potential review
+            return True, f"Flagged topic detected: {topic}"
         
         # Short messages are usually greetings/acknowledgments - allow
-        if len(text.split()) <= 5:
+        # (maxsplit stops after the sixth word instead of splitting everything)
+        if len(ctx.text.split(maxsplit=5)) <= 5:
+            return True, None
+        
+        # Check if on-topic: whole-word hits are a cheap set probe, anything
+        # else (phrases, "mortgages", "home?") needs the substring scan
+        if not self._ontopic_words.isdisjoint(ctx.text_lower.split()):
+            return True, None
+        if self._ontopic_matcher.find(ctx.text_lower):
             return True, None
         
         # Default: allow but flag as potentially off-topic
@@ -276,11 +659,23 @@ class OutputGuardrails:
     def __init__(self):
         """Initialize output guardrails."""
         self.pii_detector = PIIDetector()
+        self._leak_combined = re.compile(
+            "|".join(f"(?:{pattern.pattern})" for pattern in self.LEAK_PATTERNS),
+            re.I
+        )
+        self._forbidden_matcher = _KeywordMatcher(self.FORBIDDEN_PHRASES)
+        self._leak_prefilter = _build_prefilter(
+            (pattern.pattern for pattern in self.LEAK_PATTERNS), caseless=True
+        )
+        self._cache = _ResultCache()
     
     def check(self, response: str, system_prompt: str | None = None) -> GuardrailResult:
         """
         Check LLM response for issues.
         
+        Results are memoized on a digest of (response, system_prompt), so
+        repeated responses skip the pattern scans.
+        
         Args:
             response: The LLM's response
             system_prompt: Optional system prompt to check for leakage
@@ -288,50 +683,56 @@ class OutputGuardrails:
         Returns:
             GuardrailResult
         """
+        key = _ResultCache.key(response, system_prompt)
+        result = self._cache.get(key)
+        if result is None:
+            result = self._check(response, system_prompt)
+            self._cache.put(key, result)
+        return result
+    
+    def _check(self, response: str, system_prompt: str | None) -> GuardrailResult:
+        """Run the output checks (uncached)."""
         warnings = []
         sanitized = response
         
         # Check for system prompt leakage patterns
-        for pattern in self.LEAK_PATTERNS:
-            if pattern.search(response):
-                warnings.append("Potential system prompt leak detected")
-                break
+        if (
+            (self._leak_prefilter is None or self._leak_prefilter.may_match(response))
+            and self._leak_combined.search(response)
+        ):
+            warnings.append("Potential system prompt leak detected")
         
         # Check for forbidden phrases
-        for phrase in self.FORBIDDEN_PHRASES:
-            if phrase in response:
+        if self._forbidden_matcher.find(response):
+            return GuardrailResult(
+                allowed=False,
+                sanitized_text="",
+                blocked_reason=BlockReason.SYSTEM_PROMPT_LEAK,
+                blocked_details=f"Response contained forbidden phrase"
+            )
+        
+        # Check for substantial system prompt overlap
+        if system_prompt and len(system_prompt) > 50:
+            # Check if large chunks of system prompt appear in response
+            if _system_prompt_chunks(system_prompt).find(response):
                 return GuardrailResult(
                     allowed=False,
                     sanitized_text="",
                     blocked_reason=BlockReason.SYSTEM_PROMPT_LEAK,
-                    blocked_details=f"Response contained forbidden phrase"
+                    blocked_details="Response contained system prompt content"
                 )
         
-        # Check for substantial system prompt overlap
-        if system_prompt and len(system_prompt) > 50:
-            # Check if large chunks of system prompt appear in response
-            chunk_size = 100
-            for i in range(0, len(system_prompt) - chunk_size, 50):
-                chunk = system_prompt[i:i + chunk_size]
-                if chunk in response:
-                    return GuardrailResult(
-                        allowed=False,
-                        sanitized_text="",
-                        blocked_reason=BlockReason.SYSTEM_PROMPT_LEAK,
-                        blocked_details="Response contained system prompt content"
-                    )
-        
         # Check for PII in response
-        pii_matches = self.pii_detector.detect(response)
-        if pii_matches:
-            warnings.append(f"PII detected in response: {[m.entity_type for m in pii_matches]}")
-            sanitized = self.pii_detector.mask(response, pii_matches)
+        pii_spans = self.pii_detector.detect_spans(response)
+        if pii_spans.entity_types:
+            warnings.append(f"PII detected in response: {pii_spans.entity_types}")
+            sanitized = self.pii_detector.mask_spans(response, pii_spans)
         
         return GuardrailResult(
             allowed=True,
             sanitized_text=sanitized,
             warnings=warnings,
-            pii_detected=pii_matches
+            pii_detected=self.pii_detector.to_matches(response, pii_spans)
         )
 
 
@@ -345,6 +746,7 @@ class InputGuardrails:
         self.sanitizer = InputSanitizer()
         self.pii_detector = PIIDetector()
         self.domain_classifier = DomainClassifier()
+        self._cache = _ResultCache()
     
     def check(
         self,
@@ -355,6 +757,9 @@ class InputGuardrails:
         """
         Run all input guardrails.
         
+        Results are memoized on a digest of (text, mask_pii, block_on_pii),
+        so retried or resubmitted messages skip the pattern scans.
+        
         Args:
             text: User input text
             mask_pii: Whether to mask detected PII
@@ -363,14 +768,26 @@ class InputGuardrails:
         Returns:
             GuardrailResult with sanitized text or block reason
         """
+        key = _ResultCache.key(text, mask_pii, block_on_pii)
+        result = self._cache.get(key)
+        if result is None:
+            result = self._check(text, mask_pii, block_on_pii)
+            self._cache.put(key, result)
+        return result
+    
+    def _check(self, text: str, mask_pii: bool, block_on_pii: bool) -> GuardrailResult:
+        """Run all input guardrails (uncached)."""
         warnings = []
         
         # Step 1: Sanitize input
         sanitized, sanitize_warnings = self.sanitizer.sanitize(text)
         warnings.extend(sanitize_warnings)
         
+        ctx = GuardrailCtx.from_text(sanitized)
+        
         # Step 2: Detect PII
-        pii_matches = self.pii_detector.detect(sanitized)
+        pii_spans = self.pii_detector.detect_spans(ctx)
+        pii_matches = self.pii_detector.to_matches(ctx.text, pii_spans)
         
         if pii_matches:
             if block_on_pii:
@@ -378,22 +795,22 @@ class InputGuardrails:
                     allowed=False,
                     sanitized_text="",
                     blocked_reason=BlockReason.PII_DETECTED,
-                    blocked_details=f"Detected: {[m.entity_type for m in pii_matches]}",
+                    blocked_details=f"Detected: {pii_spans.entity_types}",
                     pii_detected=pii_matches
                 )
             
             if mask_pii:
-                sanitized = self.pii_detector.mask(sanitized, pii_matches)
-                warnings.append(f"Masked PII: {[m.entity_type for m in pii_matches]}")
+                ctx = GuardrailCtx.from_text(self.pii_detector.mask_spans(ctx.text, pii_spans))
+                warnings.append(f"Masked PII: {pii_spans.entity_types}")
         
         # Step 3: Domain classification
-        is_allowed, domain_note = self.domain_classifier.classify(sanitized)
+        is_allowed, domain_note = self.domain_classifier.classify(ctx)
         if domain_note:
             warnings.append(domain_note)
         
         return GuardrailResult(
             allowed=is_allowed,
-            sanitized_text=sanitized,
+            sanitized_text=ctx.text,
             pii_detected=pii_matches,
             warnings=warnings
         )
@@ -408,20 +825,32 @@ class IntentEvaluator:
     - Prompt injection
     """
     
-    def evaluate(self, text: str) -> GuardrailResult:
-        """Evaluate user intent. Returns GuardrailResult with allowed=False if unsafe."""
-        try:
+    def __init__(self):
+        """Initialize the intent evaluator."""
+        self._guard_llm = None
+        # The prompt has a single placeholder, so split it once instead of
+        # running str.format on every evaluation
+        self._prompt_prefix, self._prompt_suffix = GUARDRAIL_INTENT_PROMPT.split("{message}", 1)
+    
+    @property
+    def guard_llm(self):
+        """Lazy initialization of the guard LLM client, reused across evaluations."""
+        if self._guard_llm is None:
             from langchain_openai import ChatOpenAI
             
-            guard_llm = ChatOpenAI(
+            self._guard_llm = ChatOpenAI(
                 model=config.OPENAI_MODEL,
                 api_key=config.OPENAI_API_KEY,
                 base_url=config.OPENAI_BASE_URL,
                 temperature=0.0,
                 max_tokens=10,
             )
-            
-            response = guard_llm.invoke(GUARDRAIL_INTENT_PROMPT.format(message=text))
+        return self._guard_llm
+    
+    def evaluate(self, text: str) -> GuardrailResult:
+        """Evaluate user intent. Returns GuardrailResult with allowed=False if unsafe."""
+        try:
+            response = self.guard_llm.invoke(self._prompt_prefix + text + self._prompt_suffix)
             verdict = response.content.strip().upper()
             
             if "UNSAFE" in verdict:
@@ -444,33 +873,22 @@ class IntentEvaluator:
             )
 
 
-_input_guardrails: InputGuardrails | None = None
-_output_guardrails: OutputGuardrails | None = None
-_intent_evaluator: IntentEvaluator | None = None
-
-
+@functools.cache
 def get_input_guardrails() -> InputGuardrails:
     """Get or create input guardrails singleton."""
-    global _input_guardrails
-    if _input_guardrails is None:
-        _input_guardrails = InputGuardrails()
-    return _input_guardrails
+    return InputGuardrails()
 
 
+@functools.cache
 def get_output_guardrails() -> OutputGuardrails:
     """Get or create output guardrails singleton."""
-    global _output_guardrails
-    if _output_guardrails is None:
-        _output_guardrails = OutputGuardrails()
-    return _output_guardrails
+    return OutputGuardrails()
 
 
+@functools.cache
 def get_intent_evaluator() -> IntentEvaluator:
     """Get or create intent evaluator singleton."""
-    global _intent_evaluator
-    if _intent_evaluator is None:
-        _intent_evaluator = IntentEvaluator()
-    return _intent_evaluator
+    return IntentEvaluator()
 
 
 def create_input_guardrails_node(
@@ -502,11 +920,13 @@ def create_input_guardrails_node(
         guardrails = get_input_guardrails()
         
         # Get the last human message
-        human_messages = [m for m in state.messages if isinstance(m, human_message_class)]
-        if not human_messages:
+        last_human = next(
+            (m for m in reversed(state.messages) if isinstance(m, human_message_class)),
+            None
+        )
+        if last_human is None:
             return {}
         
-        last_human = human_messages[-1]
         original_content = last_human.content
         
         result = guardrails.check(
@@ -570,15 +990,16 @@ def create_output_guardrails_node(
         guardrails = get_output_guardrails()
         
         # Get the last AI message (not a tool call)
-        ai_messages = [
-            m for m in state.messages 
-            if isinstance(m, ai_message_class) and not getattr(m, 'tool_calls', None)
-        ]
-        if not ai_messages:
+        last_ai = next(
+            (
+                m for m in reversed(state.messages)
+                if isinstance(m, ai_message_class) and not getattr(m, 'tool_calls', None)
+            ),
+            None
+        )
+        if last_ai is None:
             return {}
         
-        last_ai = ai_messages[-1]
-        
         result = guardrails.check(
             response=last_ai.content,
             system_prompt=get_system_prompt()
@@ -641,12 +1062,13 @@ def create_intent_evaluator_node(human_message_class: type):
         evaluator = get_intent_evaluator()
         
         # Get the last human message
-        human_messages = [m for m in state.messages if isinstance(m, human_message_class)]
-        if not human_messages:
+        last_human = next(
+            (m for m in reversed(state.messages) if isinstance(m, human_message_class)),
+            None
+        )
+        if last_human is None:
             return {}
         
-        last_human = human_messages[-1]
-        
         result = evaluator.evaluate(last_human.content)
         
         # Combine existing warnings
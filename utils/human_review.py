@@ -2,12 +2,46 @@
 """
 Human-in-the-loop review for documents with unknown relevance.
 """
+import sys
+from collections import Counter, defaultdict, deque
+
 from langchain_core.runnables import RunnableConfig
 from langgraph.types import interrupt
 
 from config import config as app_config
 from models import ClassifiedDocument, WorkflowState
 
+# Review choices read from piped stdin (loaded on first use, shared across reviews)
+_piped_choices: deque | None = None
+
+
+def _read_choice(prompt: str) -> str:
+    """
+    Read one review choice from the user.
+    
+    Interactive terminals use input(). When stdin is piped (e.g. replaying
+    a decisions file), all lines are read up front and handed out one per
+    prompt instead of one blocking read per document.
+    """
+    global _piped_choices
+    
+    if sys.stdin.isatty():
+        return input(prompt)
+    
+    if _piped_choices is None:
+        _piped_choices = deque(sys.stdin.read().splitlines())
+    print(prompt, end="")
+    if not _piped_choices:
+        raise EOFError("No more review choices on stdin")
+    return _piped_choices.popleft()
+
+
+def _truncate(text: str | None, max_chars: int = 300) -> str | None:
+    """Truncate text to max_chars with an ellipsis, passing None/short text through."""
+    if text and len(text) > max_chars:
+        return text[:max_chars] + "..."
+    return text
+
 
 def review_unknown_documents(state: WorkflowState, config: RunnableConfig) -> dict:
     """
@@ -36,11 +70,12 @@ def review_unknown_documents(state: WorkflowState, config: RunnableConfig) -> di
     
     review_requests = []
     for doc in unknown_docs:
+        document = doc.document
         review_requests.append({
-            "file_name": doc.document.file_name,
-            "page_count": doc.document.page_count,
-            "summary": doc.document.summary[:300] + "..." if len(doc.document.summary or "") > 300 else doc.document.summary,
-            "key_entities": doc.document.key_entities[:8],
+            "file_name": document.file_name,
+            "page_count": document.page_count,
+            "summary": _truncate(document.summary),
+            "key_entities": document.key_entities[:8],
             "ai_reasoning": doc.reasoning,
         })
     
@@ -77,17 +112,22 @@ def apply_human_decisions(
     """
     updated_docs = []
     reclassified_count = 0
+    category_set = frozenset(categories)
+    get_decision = (decisions or {}).get
     
     for doc in classified_docs:
         if doc.category != "Unknown Relevance":
             updated_docs.append(doc)
             continue
         
-        decision = decisions.get(doc.document.file_name)
+        decision = get_decision(doc.document.file_name)
         
         if decision is None or decision == "skip":
             # Keep original classification
             updated_docs.append(doc)
+        elif decision == "confirm_unknown" and doc.human_reviewed:
+            # Already confirmed in an earlier review, nothing changes
+            updated_docs.append(doc)
         elif decision == "confirm_unknown":
             # Human confirmed it's irrelevant
             updated_doc = ClassifiedDocument(
@@ -100,7 +140,7 @@ def apply_human_decisions(
                 original_category="Unknown Relevance"
             )
             updated_docs.append(updated_doc)
-        elif decision in categories:
+        elif decision in category_set:
             # Human reclassified to a specific category
             updated_doc = ClassifiedDocument(
                 document=doc.document,
@@ -118,18 +158,16 @@ def apply_human_decisions(
             updated_docs.append(doc)
     
     # Rebuild classification summary
-    new_summary = {}
+    counts: Counter = Counter()
+    confidence_sums: defaultdict = defaultdict(float)
     for doc in updated_docs:
-        cat = doc.category
-        if cat not in new_summary:
-            new_summary[cat] = {"count": 0, "total_confidence": 0.0}
-        new_summary[cat]["count"] += 1
-        new_summary[cat]["total_confidence"] += doc.confidence
+        counts[doc.category] += 1
+        confidence_sums[doc.category] += doc.confidence
     
-    for cat in new_summary:
-        count = new_summary[cat]["count"]
-        new_summary[cat]["avg_confidence"] = new_summary[cat]["total_confidence"] / count if count > 0 else 0
-        del new_summary[cat]["total_confidence"]
+    new_summary = {
+        cat: {"count": count, "avg_confidence": confidence_sums[cat] / count}
+        for cat, count in counts.items()
+    }
     
     return {
         "classified_documents": updated_docs,
@@ -184,7 +222,7 @@ def collect_human_review_cli(interrupt_data: dict) -> dict[str, str | None]:
         
         while True:
             try:
-                choice = input(f"Select category (1-{len(categories) + 1}, or 0 to skip): ").strip()
+                choice = _read_choice(f"Select category (1-{len(categories) + 1}, or 0 to skip): ").strip()
                 
                 if not choice:
                     continue
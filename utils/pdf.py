@@ -5,17 +5,57 @@ Shared PDF text extraction utility.
 Provides a unified interface for extracting text from PDFs,
 with automatic OCR fallback for scanned/image-based documents.
 """
+import atexit
+import functools
+import io
 import logging
-from dataclasses import dataclass, field
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, field
+from itertools import chain, repeat
 from pathlib import Path
 
 import pdfplumber
 
 from config import config as app_config
-from utils.ocr import needs_ocr, ocr_pdf
+from utils.document_cache import document_cache
+from utils.ocr import needs_ocr, ocr_pdf, ocr_pdfs_batch
 
 logger = logging.getLogger(__name__)
 
+# Below this many pages, extracting in-process beats starting worker processes
+PARALLEL_MIN_PAGES = 4
+
+# Open PDFs kept per worker process, so later page ranges of the same
+# document skip re-parsing its cross-reference table
+_WORKER_PDF_CACHE_SIZE = 2
+_worker_pdfs: OrderedDict = OrderedDict()
+
+# Single blank page, opened once per worker to warm up pdfminer
+_WARMUP_PDF = (
+    b"%PDF-1.4\n"
+    b"1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 72 72]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF"
+)
+
+
+def _mp_context():
+    """
+    Start method for extraction workers.
+    
+    Never fork: the app process runs torch, tokenizer and Chroma threads
+    (whose held locks a forked child would inherit) and may have
+    initialized CUDA, which can't be re-initialized in a forked child.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
 
 @dataclass
 class PDFExtractionResult:
@@ -32,11 +72,182 @@ class PDFExtractionResult:
         return not self.text.strip()
 
 
+def _worker_init() -> None:
+    """Warm up pdfplumber in a new worker process."""
+    try:
+        with pdfplumber.open(io.BytesIO(_WARMUP_PDF)) as pdf:
+            pdf.pages[0].extract_text()
+    except Exception as e:
+        logger.debug(f"PDF worker warmup failed: {e}")
+
+
+@functools.lru_cache(maxsize=1)
+def _get_pool() -> ProcessPoolExecutor:
+    """Get or create the shared page extraction pool."""
+    workers = min(os.cpu_count() or 1, app_config.PDF_MAX_WORKERS)
+    pool = ProcessPoolExecutor(
+        max_workers=workers, initializer=_worker_init, mp_context=_mp_context()
+    )
+    atexit.register(pool.shutdown)
+    return pool
+
+
+def _open_cached(pdf_path: str):
+    """Open a PDF in a worker, reusing it while the file is unchanged."""
+    stat = os.stat(pdf_path)
+    key = (pdf_path, stat.st_mtime_ns, stat.st_size)
+    pdf = _worker_pdfs.get(key)
+    if pdf is not None:
+        _worker_pdfs.move_to_end(key)
+        return pdf
+    
+    pdf = pdfplumber.open(pdf_path)
+    _worker_pdfs[key] = pdf
+    if len(_worker_pdfs) > _WORKER_PDF_CACHE_SIZE:
+        _, evicted = _worker_pdfs.popitem(last=False)
+        evicted.close()
+    return pdf
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> list[str]:
+    """
+    Extract raw text from pages [start, stop) of a PDF.
+    
+    Runs in a worker process.
+    """
+    pdf = _open_cached(pdf_path)
+    texts = []
+    for i in range(start, stop):
+        page = pdf.pages[i]
+        texts.append(page.extract_text() or "")
+        # Drop the page's parsed layout; only the document structure is reused
+        page.close()
+    return texts
+
+
+def _extract_pages(pdf, pdf_path: Path, page_count: int) -> list[str]:
+    """
+    Extract raw text for every page of an open PDF, in page order.
+    
+    pdfplumber's layout analysis is CPU-bound pure Python, so larger
+    documents are split into page ranges and extracted across processes.
+    """
+    workers = min(os.cpu_count() or 1, page_count, app_config.PDF_MAX_WORKERS)
+    if page_count < PARALLEL_MIN_PAGES or workers <= 1:
+        return [page.extract_text() or "" for page in pdf.pages]
+    
+    step = max(1, page_count // (4 * workers))
+    starts = range(0, page_count, step)
+    stops = [min(start + step, page_count) for start in starts]
+    try:
+        ranges = _get_pool().map(_extract_page_range, repeat(str(pdf_path)), starts, stops)
+        return list(chain.from_iterable(ranges))
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool next time and finish in-process
+        logger.warning(f"PDF worker pool failed, extracting {pdf_path.name} in-process")
+        _get_pool.cache_clear()
+        return [page.extract_text() or "" for page in pdf.pages]
+
+
+def _extract_without_ocr(pdf_path: Path, include_page_markers: bool) -> PDFExtractionResult:
+    """
+    Extract the embedded text layer of a PDF with pdfplumber.
+    
+    Raises:
+        RuntimeError: If extraction fails
+    """
+    page_texts = []
+    page_count = 0
+    pdf_metadata = {}
+    
+    try:
+        with pdfplumber.open(pdf_path) as pdf:
+            page_count = len(pdf.pages)
+            
+            # Extract PDF metadata if available
+            if app_config.PDF_KEEP_METADATA:
+                pdf_metadata = {
+                    k: v if isinstance(v, str) else str(v)
+                    for k, v in (pdf.metadata or {}).items()
+                    if v is not None
+                }
+            
+            # Extract text from each page
+            page_texts = _extract_pages(pdf, pdf_path, page_count)
+        
+    except Exception as e:
+        raise RuntimeError(f"Failed to extract text from {pdf_path}: {str(e)}")
+    
+    # Join non-blank pages (isspace() tests blankness without copying the page)
+    if include_page_markers:
+        text = "\n\n".join(
+            f"--- Page {i + 1} ---\n{page_text}"
+            for i, page_text in enumerate(page_texts)
+            if page_text and not page_text.isspace()
+        )
+    else:
+        text = "\n\n".join(
+            page_text for page_text in page_texts
+            if page_text and not page_text.isspace()
+        )
+    
+    return PDFExtractionResult(
+        text=text,
+        page_count=page_count,
+        pdf_metadata=pdf_metadata,
+    )
+
+
+def _wants_ocr(result: PDFExtractionResult, ocr_enabled: bool, chars_threshold: int) -> bool:
+    """Check whether OCR is enabled and the text layer looks too sparse."""
+    return ocr_enabled and needs_ocr(result.text, result.page_count, chars_threshold)
+
+
+def _apply_ocr(result: PDFExtractionResult, ocr_text: str, ocr_metadata: dict) -> None:
+    """Replace the extracted text with OCR output, if OCR found any text."""
+    if ocr_text.strip():
+        result.text = ocr_text
+        result.ocr_used = True
+        result.ocr_confidence = ocr_metadata.get("ocr_avg_confidence")
+
+
+def _flush_ocr(deferred_ocr: list[tuple[Path, PDFExtractionResult]]) -> set[Path]:
+    """
+    Run OCR for deferred documents as one batch.
+    
+    If the batch fails, each document is retried on its own so one bad
+    PDF doesn't cost the others their OCR text.
+    
+    Returns:
+        Paths of the documents whose OCR failed
+    """
+    try:
+        outputs = ocr_pdfs_batch([pdf_path for pdf_path, _ in deferred_ocr])
+    except Exception as e:
+        logger.debug(f"Batch OCR failed, retrying per document: {e}")
+        outputs = []
+        for pdf_path, _ in deferred_ocr:
+            try:
+                outputs.append(ocr_pdf(pdf_path))
+            except Exception as e:
+                logger.debug(f"OCR failed for {pdf_path.name}, using pdfplumber text: {e}")
+                outputs.append(None)
+    
+    failed = set()
+    for (pdf_path, result), output in zip(deferred_ocr, outputs):
+        if output is not None:
+            _apply_ocr(result, *output)
+        else:
+            failed.add(pdf_path)
+    return failed
+
+
 def extract_text_from_pdf(
     pdf_path: Path | str,
     include_page_markers: bool = False,
     use_ocr: bool | None = None,
     min_chars_per_page: int | None = None,
+    use_cache: bool = True,
 ) -> PDFExtractionResult:
     """
     Extract text from a PDF file with optional OCR fallback.
@@ -46,6 +257,7 @@ def extract_text_from_pdf(
         include_page_markers: If True, add "--- Page X ---" markers between pages
         use_ocr: Override OCR setting (None = use config.OCR_ENABLED)
         min_chars_per_page: Override minimum chars threshold for OCR trigger
+        use_cache: Reuse (and store) results cached for identical file contents
         
     Returns:
         PDFExtractionResult with extracted text and metadata
@@ -54,61 +266,79 @@ def extract_text_from_pdf(
         FileNotFoundError: If PDF file doesn't exist
         RuntimeError: If extraction fails completely
     """
-    pdf_path = Path(pdf_path)
-    if not pdf_path.exists():
-        raise FileNotFoundError(f"PDF not found: {pdf_path}")
+    return extract_text_from_pdfs(
+        [pdf_path],
+        include_page_markers=include_page_markers,
+        use_ocr=use_ocr,
+        min_chars_per_page=min_chars_per_page,
+        use_cache=use_cache,
+    )[0]
+
+
+def extract_text_from_pdfs(
+    pdf_paths: list[Path | str],
+    include_page_markers: bool = False,
+    use_ocr: bool | None = None,
+    min_chars_per_page: int | None = None,
+    use_cache: bool = True,
+) -> list[PDFExtractionResult]:
+    """
+    Extract text from several PDF files with optional OCR fallback.
+    
+    OCR for documents that need it is deferred until every text layer has
+    been read, then run as one batch across documents. Results are cached
+    by file content hash and extraction settings, so unchanged PDFs are not
+    re-extracted (or re-OCR'd) on later runs.
+    
+    Args:
+        pdf_paths: Paths to the PDF files
+        include_page_markers: If True, add "--- Page X ---" markers between pages
+        use_ocr: Override OCR setting (None = use config.OCR_ENABLED)
+        min_chars_per_page: Override minimum chars threshold for OCR trigger
+        use_cache: Reuse (and store) results cached for identical file contents
     
+    Returns:
+        List of PDFExtractionResult, one per PDF in input order
+    
+    Raises:
+        FileNotFoundError: If a PDF file doesn't exist
+        RuntimeError: If extraction of a PDF fails completely
+    """
     # Determine OCR settings
     ocr_enabled = use_ocr if use_ocr is not None else app_config.OCR_ENABLED
     chars_threshold = min_chars_per_page or app_config.OCR_MIN_CHARS_PER_PAGE
+    settings = (
+        f"ocr={ocr_enabled};min_chars={chars_threshold};markers={include_page_markers};"
+        f"metadata={app_config.PDF_KEEP_METADATA}"
+    )
     
-    text_parts = []
-    page_count = 0
-    pdf_metadata = {}
+    results = []
+    deferred_ocr = []
+    to_store = []
     
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            page_count = len(pdf.pages)
-            
-            # Extract PDF metadata if available
-            if pdf.metadata:
-                pdf_metadata = {
-                    k: str(v) for k, v in pdf.metadata.items() 
-                    if v is not None
-                }
-            
-            # Extract text from each page
-            for i, page in enumerate(pdf.pages):
-                page_text = page.extract_text() or ""
-                if page_text.strip():
-                    if include_page_markers:
-                        text_parts.append(f"--- Page {i + 1} ---\n{page_text}")
-                    else:
-                        text_parts.append(page_text)
-        
-        full_text = "\n\n".join(text_parts)
-        
-        # Check if OCR is needed
-        ocr_used = False
-        ocr_confidence = None
-        
-        if ocr_enabled and needs_ocr(full_text, page_count, chars_threshold):
-            try:
-                ocr_text, ocr_metadata = ocr_pdf(pdf_path)
-                if ocr_text.strip():
-                    full_text = ocr_text
-                    ocr_used = True
-                    ocr_confidence = ocr_metadata.get("ocr_avg_confidence")
-            except Exception as e:
-                logger.debug(f"OCR failed for {pdf_path.name}, using pdfplumber text: {e}")
+    for pdf_path in map(Path, pdf_paths):
+        if not pdf_path.exists():
+            raise FileNotFoundError(f"PDF not found: {pdf_path}")
         
-        return PDFExtractionResult(
-            text=full_text,
-            page_count=page_count,
-            ocr_used=ocr_used,
-            ocr_confidence=ocr_confidence,
-            pdf_metadata=pdf_metadata,
-        )
+        if use_cache:
+            content_hash = document_cache.compute_hash(pdf_path)
+            cached = document_cache.get_pdf_text(content_hash, settings)
+            if cached is not None:
+                results.append(PDFExtractionResult(**cached))
+                continue
         
-    except Exception as e:
-        raise RuntimeError(f"Failed to extract text from {pdf_path}: {str(e)}")
+        result = _extract_without_ocr(pdf_path, include_page_markers)
+        if _wants_ocr(result, ocr_enabled, chars_threshold):
+            deferred_ocr.append((pdf_path, result))
+        results.append(result)
+        if use_cache:
+            to_store.append((content_hash, pdf_path, result))
+    
+    ocr_failed = _flush_ocr(deferred_ocr) if deferred_ocr else set()
+    
+    # Don't cache text from failed OCR, so the next run retries it
+    for content_hash, pdf_path, result in to_store:
+        if pdf_path not in ocr_failed:
+            document_cache.store_pdf_text(content_hash, settings, asdict(result))
+    
+    return results
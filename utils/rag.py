@@ -4,18 +4,335 @@ RAG (Retrieval-Augmented Generation) utilities for the mortgage assistant.
 
 Uses ChromaDB for vector storage and HuggingFace embeddings.
 """
+import functools
+import hashlib
 import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
 
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+import numpy as np
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
 from config import config
 
+# chromadb and langchain_huggingface (torch) are slow to import, so they're
+# loaded on first use; ingestion workers only need the splitter
+if TYPE_CHECKING:
+    import chromadb
+    from langchain_huggingface import HuggingFaceEmbeddings
+    
+    from utils.pdf import PDFExtractionResult
+
 logger = logging.getLogger(__name__)
 
+# Retrieval results kept per RAGManager (LRU), and how long they stay valid
+# for ingestion done by other processes
+RESULTS_CACHE_SIZE = 256
+RESULTS_CACHE_TTL_SECONDS = 60
+
+# HNSW parameters for new collections. Chroma's defaults (M=16,
+# construction_ef=100, search_ef=10) favor tiny collections; search_ef
+# stays well above k * 4 for any reasonable RAG_TOP_K. The distance space
+# stays L2, which retrieve()'s max_distance and relevance scores assume.
+HNSW_METADATA = {
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 128,
+}
+
+
+@functools.cache
+def _float32_normalized_embeddings_class() -> type["HuggingFaceEmbeddings"]:
+    """Define the float32-normalizing embeddings class on first use."""
+    from langchain_huggingface import HuggingFaceEmbeddings
+    
+    class _Float32NormalizedEmbeddings(HuggingFaceEmbeddings):
+        """
+        HuggingFace embeddings L2-normalized in float32 with NumPy.
+        
+        The whole batch is normalized in place in one pass. With
+        reduced-precision weights, vectors are upcast first, so distances in
+        Chroma stay comparable to the float32 model's.
+        """
+        
+        def embed_documents(self, texts: list[str]) -> list[list[float]]:
+            """Embed documents, normalizing the float32 vectors."""
+            vectors = np.asarray(super().embed_documents(texts), dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.maximum(norms, 1e-12)
+            return vectors.tolist()
+        
+        def embed_query(self, text: str) -> list[float]:
+            """Embed a query, normalizing the float32 vector."""
+            return self.embed_documents([text])[0]
+    
+    return _Float32NormalizedEmbeddings
+
+
+def _build_embeddings(model_name: str) -> "HuggingFaceEmbeddings":
+    """
+    Create the embedding model, in the dtype set by RAG_EMBEDDING_DTYPE.
+    
+    bfloat16 or float16 load reduced-precision weights, halving memory
+    traffic on hardware with native support for them. RAG_EMBEDDING_ONNX_FILE
+    instead runs an ONNX export (e.g. int8-quantized) with ONNX Runtime.
+    Every variant returns numpy batches from sentence-transformers and
+    normalizes them in float32.
+    """
+    model_kwargs = {'device': 'cpu'}  # Use CPU for embeddings
+    if config.RAG_EMBEDDING_ONNX_FILE:
+        model_kwargs['backend'] = 'onnx'
+        model_kwargs['model_kwargs'] = {'file_name': config.RAG_EMBEDDING_ONNX_FILE}
+    elif config.RAG_EMBEDDING_DTYPE != "float32":
+        model_kwargs['model_kwargs'] = {'torch_dtype': config.RAG_EMBEDDING_DTYPE}
+    
+    return _float32_normalized_embeddings_class()(
+        model_name=model_name,
+        model_kwargs=model_kwargs,
+        encode_kwargs={'normalize_embeddings': False, 'convert_to_numpy': True}
+    )
+
+
+def _mmr_select(
+    query_vector: np.ndarray,
+    vectors: np.ndarray,
+    k: int,
+    lambda_mult: float,
+) -> list[int]:
+    """
+    Pick k diverse, relevant rows of vectors by maximal marginal relevance.
+    
+    All pairwise similarities are computed in one matrix product; each step
+    then scores every candidate at once and masks out those already chosen.
+    
+    Args:
+        query_vector: Normalized query embedding
+        vectors: Normalized candidate embeddings, one per row
+        k: Number of candidates to select
+        lambda_mult: Relevance vs. diversity trade-off (1 = relevance only)
+    
+    Returns:
+        Indices of the selected candidates, in selection order
+    """
+    query_sim = vectors @ query_vector
+    pair_sim = vectors @ vectors.T
+    
+    first = int(np.argmax(query_sim))
+    selected = [first]
+    redundancy = pair_sim[first].copy()
+    available = np.ones(len(vectors), dtype=bool)
+    available[first] = False
+    
+    while len(selected) < min(k, len(vectors)):
+        scores = lambda_mult * query_sim - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, pair_sim[best], out=redundancy)
+    
+    return selected
+
+
+class _ChunkedPDF(NamedTuple):
+    """Text chunks extracted from one PDF, ready for embedding."""
+    file_name: str
+    file_fingerprint: str  # Size and mtime of the PDF when it was read
+    content_hash: str  # SHA256 of the extracted text
+    chunks: list[str]
+    ocr_used: bool
+    ocr_confidence: float | None
+
+
+@functools.cache
+def _build_text_splitter() -> RecursiveCharacterTextSplitter:
+    """
+    Text splitter for chunking documents (config-driven).
+    
+    Shared by every PDF in a process; splitting keeps no state between calls.
+    """
+    return RecursiveCharacterTextSplitter(
+        chunk_size=config.RAG_CHUNK_SIZE,
+        chunk_overlap=config.RAG_CHUNK_OVERLAP,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+
+
+def _file_fingerprint(pdf_path: Path) -> str:
+    """Cheap change marker for a PDF on disk (size and modification time)."""
+    stat = pdf_path.stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _chunk_extraction(
+    pdf_path: Path, fingerprint: str, extraction: "PDFExtractionResult"
+) -> _ChunkedPDF:
+    """Split a PDF's extracted text into chunks."""
+    content_hash = hashlib.sha256(extraction.text.encode()).hexdigest()
+    chunks = [] if extraction.is_empty else _build_text_splitter().split_text(extraction.text)
+    return _ChunkedPDF(
+        pdf_path.name, fingerprint, content_hash, chunks,
+        extraction.ocr_used, extraction.ocr_confidence,
+    )
+
+
+def _extract_and_chunk(pdf_path: Path) -> _ChunkedPDF:
+    """Extract a PDF's text (with OCR fallback) and split it into chunks."""
+    from utils.pdf import extract_text_from_pdf
+    
+    fingerprint = _file_fingerprint(pdf_path)
+    return _chunk_extraction(pdf_path, fingerprint, extract_text_from_pdf(pdf_path))
+
+
+def _extract_text_layer_and_chunk(pdf_path: Path) -> _ChunkedPDF | None:
+    """
+    Extract a PDF's text layer and split it into chunks.
+    
+    Touches neither the vector store, the embedding model nor the OCR
+    model, so it can run in a worker process.
+    
+    Returns:
+        The chunked text, or None if the PDF needs OCR instead
+    """
+    from utils.ocr import needs_ocr
+    from utils.pdf import extract_text_from_pdf
+    
+    fingerprint = _file_fingerprint(pdf_path)
+    extraction = extract_text_from_pdf(pdf_path, use_ocr=False)
+    if config.OCR_ENABLED and needs_ocr(
+        extraction.text, extraction.page_count, config.OCR_MIN_CHARS_PER_PAGE
+    ):
+        return None
+    return _chunk_extraction(pdf_path, fingerprint, extraction)
+
+
+def _ocr_and_chunk(pdf_files: list[Path]):
+    """
+    Yield the chunked text of PDFs that need OCR, OCR'd here in one batch.
+    
+    One OCR model is loaded for all of them, and pages are batched across
+    documents. If the batch fails, each PDF is retried on its own.
+    """
+    from utils.pdf import extract_text_from_pdf, extract_text_from_pdfs
+    
+    print(f"  OCR: {len(pdf_files)} scanned PDF(s)")
+    fingerprints = [_file_fingerprint(pdf_path) for pdf_path in pdf_files]
+    try:
+        extractions = extract_text_from_pdfs(pdf_files)
+    except Exception as e:
+        logger.debug(f"Batch OCR extraction failed, retrying per document: {e}")
+    else:
+        for pdf_path, fingerprint, extraction in zip(pdf_files, fingerprints, extractions):
+            yield _chunk_extraction(pdf_path, fingerprint, extraction)
+        return
+    
+    for pdf_path, fingerprint in zip(pdf_files, fingerprints):
+        try:
+            yield _chunk_extraction(pdf_path, fingerprint, extract_text_from_pdf(pdf_path))
+        except Exception as e:
+            print(f"    Error processing {pdf_path.name}: {e}")
+
+
+def _ingest_worker_init() -> None:
+    """Keep page extraction in-process inside ingestion workers."""
+    config.PDF_MAX_WORKERS = 1
+
+
+def _file_key(metadata: dict) -> tuple[str, str]:
+    """(source, file_fingerprint) identifying the PDF a chunk came from."""
+    return metadata["source"], metadata["file_fingerprint"]
+
+
+def _to_documents(chunked: _ChunkedPDF) -> list[Document]:
+    """Wrap a PDF's chunks as Documents with source metadata."""
+    return [
+        Document(
+            page_content=chunk,
+            metadata={
+                "source": chunked.file_name,
+                "file_fingerprint": chunked.file_fingerprint,
+                "chunk_index": i,
+                "ocr_used": chunked.ocr_used,
+                "content_hash": chunked.content_hash,
+            }
+        )
+        for i, chunk in enumerate(chunked.chunks)
+    ]
+
+
+def _iter_text_layers(pdf_files: list[Path]):
+    """
+    Yield (pdf_path, chunked text layer or None) per PDF, across processes.
+    
+    Failures are reported and skipped. Results arrive in completion order.
+    """
+    workers = min(os.cpu_count() or 1, len(pdf_files))
+    if workers <= 1:
+        for pdf_path in pdf_files:
+            print(f"  Processing: {pdf_path.name}")
+            try:
+                yield pdf_path, _extract_text_layer_and_chunk(pdf_path)
+            except Exception as e:
+                print(f"    Error processing {pdf_path.name}: {e}")
+        return
+    
+    from utils.pdf import _mp_context
+    
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_ingest_worker_init, mp_context=_mp_context()
+    ) as executor:
+        futures = {
+            executor.submit(_extract_text_layer_and_chunk, pdf_path): pdf_path
+            for pdf_path in pdf_files
+        }
+        for future in as_completed(futures):
+            pdf_path = futures[future]
+            print(f"  Processed: {pdf_path.name}")
+            try:
+                yield pdf_path, future.result()
+            except Exception as e:
+                print(f"    Error processing {pdf_path.name}: {e}")
+
+
+def _iter_chunked(pdf_files: list[Path]):
+    """
+    Yield the chunked text of each PDF.
+    
+    Text layers are extracted across processes; PDFs whose text layer is
+    too sparse come back here and are OCR'd together at the end, so workers
+    never load the OCR model. Failures are reported and skipped.
+    """
+    ocr_files = []
+    for pdf_path, chunked in _iter_text_layers(pdf_files):
+        if chunked is None:
+            ocr_files.append(pdf_path)
+        else:
+            yield chunked
+    
+    if ocr_files:
+        yield from _ocr_and_chunk(ocr_files)
+
+
+def _report_chunked(chunked: _ChunkedPDF) -> None:
+    """Print the ingestion outcome for one PDF."""
+    if chunked.ocr_used:
+        confidence = chunked.ocr_confidence or 0
+        print(f"    OCR used (confidence: {confidence:.0%})")
+    
+    if not chunked.chunks:
+        print(f"    Warning: No text extracted from {chunked.file_name}")
+        return
+    
+    ocr_tag = " (via OCR)" if chunked.ocr_used else ""
+    print(f"    Created {len(chunked.chunks)} chunks{ocr_tag}")
+
 
 class RAGManager:
     """Manages the RAG knowledge base - ingestion and retrieval."""
@@ -40,33 +357,50 @@ class RAGManager:
         
         # Initialize embeddings
         logger.info(f"Loading embedding model: {self.embedding_model}")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=self.embedding_model,
-            model_kwargs={'device': 'cpu'},  # Use CPU for embeddings
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        self.embeddings = _build_embeddings(self.embedding_model)
         
         # Text splitter for chunking documents (config-driven)
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=config.RAG_CHUNK_SIZE,
-            chunk_overlap=config.RAG_CHUNK_OVERLAP,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
+        self.text_splitter = _build_text_splitter()
+        
+        self._client: "chromadb.ClientAPI | None" = None
+        self._collection: "chromadb.Collection | None" = None
+        
+        # Query embeddings and retrieval results are cached; results are keyed
+        # on a generation bumped by every write to the collection
+        self._embed_query_cached = functools.lru_cache(maxsize=256)(self._embed_query)
+        self._results_cache: OrderedDict = OrderedDict()
+        self._results_lock = threading.Lock()
+        self._generation = 0
         
-        self._vectorstore: Chroma | None = None
+        # Only a positive answer is cached, so documents ingested by another
+        # process are picked up by the next check
+        self._has_docs = False
+        
+        # (source, file_fingerprint) -> chunk count of PDFs already stored,
+        # loaded on the first directory ingest
+        self._known_files: dict[tuple[str, str], int] | None = None
     
     @property
-    def vectorstore(self) -> Chroma:
-        """Lazy initialization of the vector store."""
-        if self._vectorstore is None:
-            self.persist_directory.mkdir(parents=True, exist_ok=True)
-            self._vectorstore = Chroma(
-                collection_name=self.collection_name,
-                embedding_function=self.embeddings,
-                persist_directory=str(self.persist_directory)
-            )
-        return self._vectorstore
+    def collection(self) -> "chromadb.Collection":
+        """Lazy initialization of the ChromaDB collection."""
+        if self._collection is None:
+            if self._client is None:
+                from utils.chroma_db import connect_chroma
+                
+                self._client = connect_chroma(self.persist_directory)
+            # Embeddings are always computed here and passed in explicitly.
+            # Index parameters only apply when the collection is created, so
+            # an existing knowledge base is opened as-is (without rewriting
+            # its metadata) and picks them up after clear + re-ingest.
+            existing = {c.name for c in self._client.list_collections()}
+            if self.collection_name in existing:
+                self._collection = self._client.get_collection(self.collection_name)
+            else:
+                self._collection = self._client.get_or_create_collection(
+                    name=self.collection_name,
+                    metadata=HNSW_METADATA,
+                )
+        return self._collection
     
     def ingest_pdf(self, pdf_path: str | Path) -> int:
         """
@@ -80,43 +414,25 @@ class RAGManager:
         Returns:
             Number of chunks created
         """
-        from utils.pdf import extract_text_from_pdf
-        
         pdf_path = Path(pdf_path)
         print(f"  Processing: {pdf_path.name}")
         
         # Use shared PDF extraction utility
-        extraction = extract_text_from_pdf(pdf_path)
-        
-        if extraction.ocr_used:
-            confidence = extraction.ocr_confidence or 0
-            print(f"    OCR used (confidence: {confidence:.0%})")
+        chunked = _extract_and_chunk(pdf_path)
         
-        if extraction.is_empty:
-            print(f"    Warning: No text extracted from {pdf_path.name}")
-            return 0
-        
-        # Split into chunks
-        chunks = self.text_splitter.split_text(extraction.text)
-        
-        # Create documents with metadata
-        documents = [
-            Document(
-                page_content=chunk,
-                metadata={
-                    "source": pdf_path.name,
-                    "chunk_index": i,
-                    "ocr_used": extraction.ocr_used,
-                }
-            )
-            for i, chunk in enumerate(chunks)
-        ]
+        # Skip embedding text that is already in the knowledge base
+        if chunked.chunks:
+            existing = self._ingested_chunk_count(chunked.content_hash)
+            if existing:
+                print(f"    Already ingested ({existing} chunks), skipped")
+                return existing
         
         # Add to vector store
-        self.vectorstore.add_documents(documents)
+        documents = _to_documents(chunked)
+        if self._add_documents_batched(documents):
+            raise RuntimeError(f"Failed to add {pdf_path.name} to the knowledge base")
         
-        ocr_tag = " (via OCR)" if extraction.ocr_used else ""
-        print(f"    Created {len(documents)} chunks{ocr_tag}")
+        _report_chunked(chunked)
         return len(documents)
     
     def ingest_directory(self, directory: str | Path | None = None) -> dict:
@@ -143,16 +459,50 @@ class RAGManager:
         print(f"Ingesting {len(pdf_files)} PDF files from {directory}")
         print("=" * 60)
         
-        total_chunks = 0
         successful_files = 0
+        skipped_chunks = 0
+        documents: list[Document] = []
+        queued_hashes: set[str] = set()
         
+        # Files unchanged since they were ingested skip extraction entirely
+        known_files = self._ingested_files()
+        to_extract = []
         for pdf_path in pdf_files:
-            try:
-                chunks = self.ingest_pdf(pdf_path)
-                total_chunks += chunks
+            existing = known_files.get((pdf_path.name, _file_fingerprint(pdf_path)))
+            if existing:
+                print(f"  Unchanged: {pdf_path.name} ({existing} chunks), skipped")
                 successful_files += 1
-            except Exception as e:
-                print(f"    Error processing {pdf_path.name}: {e}")
+                skipped_chunks += existing
+            else:
+                to_extract.append(pdf_path)
+        
+        # Extract and chunk every PDF first (across processes), so all chunks
+        # can be embedded together; this process stays the only Chroma writer
+        for chunked in _iter_chunked(to_extract):
+            successful_files += 1
+            
+            # Skip text already in the knowledge base (or queued in this run)
+            if chunked.chunks:
+                if chunked.content_hash in queued_hashes:
+                    existing = len(chunked.chunks)
+                else:
+                    existing = self._ingested_chunk_count(chunked.content_hash)
+                if existing:
+                    print(f"    Already ingested ({existing} chunks), skipped")
+                    skipped_chunks += existing
+                    continue
+                queued_hashes.add(chunked.content_hash)
+            
+            documents.extend(_to_documents(chunked))
+            _report_chunked(chunked)
+        
+        total_chunks = len(documents) + skipped_chunks
+        failed_files = self._add_documents_batched(documents)
+        if failed_files:
+            successful_files -= len(failed_files)
+            total_chunks -= sum(
+                1 for doc in documents if _file_key(doc.metadata) in failed_files
+            )
         
         print("=" * 60)
         print(f"Ingestion complete: {successful_files} files, {total_chunks} chunks")
@@ -163,11 +513,85 @@ class RAGManager:
             "failed": len(pdf_files) - successful_files
         }
     
+    def _ingested_files(self) -> dict[tuple[str, str], int]:
+        """Chunk counts of stored PDFs, keyed on (source, file_fingerprint)."""
+        if self._known_files is None:
+            known_files: dict[tuple[str, str], int] = {}
+            if self.has_documents():
+                stored = self.collection.get(include=["metadatas"])
+                for metadata in stored["metadatas"]:
+                    fingerprint = metadata.get("file_fingerprint")
+                    if fingerprint:
+                        key = (metadata.get("source"), fingerprint)
+                        known_files[key] = known_files.get(key, 0) + 1
+            self._known_files = known_files
+        return self._known_files
+    
+    def _ingested_chunk_count(self, content_hash: str) -> int:
+        """Count stored chunks of extracted text with the given hash."""
+        existing = self.collection.get(where={"content_hash": content_hash}, include=[])
+        return len(existing["ids"])
+    
+    def _add_documents_batched(self, documents: list[Document]) -> set[tuple[str, str]]:
+        """
+        Add documents to the vector store in fixed-size embedding batches.
+        
+        Documents are ordered by length first, so each batch holds chunks of
+        similar size and the embedding model pads as little as possible.
+        Chunk order carries no meaning in the store (source and chunk_index
+        are kept in metadata).
+        
+        A failed batch doesn't stop the others. Every file with a chunk in a
+        failed batch has its stored chunks removed again, so a later ingest
+        re-adds the whole file instead of skipping it as unchanged.
+        
+        Returns:
+            (source, file_fingerprint) of the files that failed
+        """
+        if documents:
+            self._generation += 1
+        documents = sorted(documents, key=lambda doc: len(doc.page_content))
+        batch_size = config.RAG_EMBED_BATCH
+        failed_files: set[tuple[str, str]] = set()
+        for i in range(0, len(documents), batch_size):
+            batch = documents[i:i + batch_size]
+            texts = [doc.page_content for doc in batch]
+            try:
+                self.collection.add(
+                    ids=[str(uuid.uuid4()) for _ in batch],
+                    embeddings=self.embeddings.embed_documents(texts),
+                    documents=texts,
+                    metadatas=[doc.metadata for doc in batch],
+                )
+            except Exception as e:
+                logger.error(f"Failed to add {len(batch)} chunks to the knowledge base: {e}")
+                failed_files.update(_file_key(doc.metadata) for doc in batch)
+            else:
+                self._has_docs = True
+        
+        for source, fingerprint in failed_files:
+            print(f"    Error adding {source} to the knowledge base")
+            try:
+                self.collection.delete(where={
+                    "$and": [{"source": source}, {"file_fingerprint": fingerprint}]
+                })
+            except Exception as e:
+                logger.error(f"Failed to remove partial chunks of {source}: {e}")
+        
+        # Only files whose every chunk was stored count as ingested
+        if self._known_files is not None:
+            for doc in documents:
+                key = _file_key(doc.metadata)
+                if key not in failed_files:
+                    self._known_files[key] = self._known_files.get(key, 0) + 1
+        return failed_files
+    
     def retrieve(
         self, 
         query: str, 
         k: int | None = None,
-        max_distance: float = 2.0
+        max_distance: float = 2.0,
+        use_mmr: bool = False,
     ) -> list[Document]:
         """
         Retrieve relevant documents for a query.
@@ -176,6 +600,8 @@ class RAGManager:
             query: The search query
             k: Number of documents to retrieve (default: config.RAG_TOP_K)
             max_distance: Maximum distance score (lower is more similar, typically 0-2)
+            use_mmr: Fetch RAG_MMR_FETCH_MULTIPLIER * k candidates and keep the k
+                most relevant yet mutually diverse ones (maximal marginal relevance)
             
         Returns:
             List of relevant documents
@@ -184,17 +610,75 @@ class RAGManager:
         if not self.has_documents():
             return []
         
-        # Use similarity search with scores
-        results = self.vectorstore.similarity_search_with_score(query, k=k)
+        # Writes through this manager bump the generation; entries also
+        # expire so writes from other processes (e.g. CLI ingestion) show up
+        key = (self._generation, query, k, max_distance, use_mmr)
+        now = time.monotonic()
+        with self._results_lock:
+            entry = self._results_cache.get(key)
+            if entry is not None and now - entry[0] < RESULTS_CACHE_TTL_SECONDS:
+                self._results_cache.move_to_end(key)
+                docs = entry[1]
+            else:
+                docs = None
+        
+        if docs is None:
+            docs = self._search(query, k, max_distance, use_mmr)
+            with self._results_lock:
+                self._results_cache[key] = (now, docs)
+                self._results_cache.move_to_end(key)
+                if len(self._results_cache) > RESULTS_CACHE_SIZE:
+                    self._results_cache.popitem(last=False)
+        
+        # Hand out copies, since callers may modify document metadata
+        return [
+            Document(page_content=doc.page_content, metadata=dict(doc.metadata))
+            for doc in docs
+        ]
+    
+    def _embed_query(self, query: str) -> tuple[float, ...]:
+        """Embed a query (uncached)."""
+        return tuple(self.embeddings.embed_query(query))
+    
+    def _search(
+        self,
+        query: str,
+        k: int,
+        max_distance: float,
+        use_mmr: bool,
+    ) -> list[Document]:
+        """Query the collection for a query's nearest chunks (uncached)."""
+        query_embedding = list(self._embed_query_cached(query))
+        include = ["documents", "metadatas", "distances"]
+        if use_mmr:
+            include.append("embeddings")
+        results = self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=k * config.RAG_MMR_FETCH_MULTIPLIER if use_mmr else k,
+            include=include,
+        )
+        texts = results["documents"][0]
+        metadatas = results["metadatas"][0]
+        distances = results["distances"][0]
+        
+        order = range(len(texts))
+        if use_mmr and texts:
+            order = _mmr_select(
+                np.asarray(query_embedding, dtype=np.float32),
+                np.asarray(results["embeddings"][0], dtype=np.float32),
+                k,
+                config.RAG_MMR_LAMBDA,
+            )
         
         # Filter by distance threshold (lower distance = more relevant)
-        filtered_docs = []
-        for doc, distance in results:
-            if distance <= max_distance:
-                doc.metadata["distance_score"] = distance
-                filtered_docs.append(doc)
-        
-        return filtered_docs
+        return [
+            Document(
+                page_content=texts[i],
+                metadata={**(metadatas[i] or {}), "distance_score": distances[i]},
+            )
+            for i in order
+            if distances[i] <= max_distance
+        ]
     
     def retrieve_with_context(self, query: str, k: int | None = None) -> str:
         """
@@ -207,36 +691,33 @@ class RAGManager:
         Returns:
             Formatted context string for LLM prompt
         """
-        docs = self.retrieve(query, k=k or config.RAG_TOP_K)
+        docs = self.retrieve(query, k=k or config.RAG_TOP_K, use_mmr=config.RAG_USE_MMR)
         
         if not docs:
             return ""
         
-        context_parts = []
-        for i, doc in enumerate(docs, 1):
-            source = doc.metadata.get("source", "Unknown")
-            distance = doc.metadata.get("distance_score", 0)
-            # Convert distance to a relevance indicator (lower distance = higher relevance)
-            relevance = max(0, 1 - distance/2)  # Normalize to 0-1 range
-            context_parts.append(
-                f"[Source {i}: {source} (relevance: {relevance:.0%})]\n{doc.page_content}"
-            )
-        
-        return "\n\n---\n\n".join(context_parts)
+        # Relevance converts distance to 0-1 (lower distance = higher relevance)
+        return "\n\n---\n\n".join(
+            f"[Source {i}: {doc.metadata.get('source', 'Unknown')} "
+            f"(relevance: {max(0, 1 - doc.metadata.get('distance_score', 0) / 2):.0%})]\n"
+            f"{doc.page_content}"
+            for i, doc in enumerate(docs, 1)
+        )
     
     def has_documents(self) -> bool:
         """Check if the knowledge base has any documents."""
+        if self._has_docs:
+            return True
         try:
-            count = self.vectorstore._collection.count()
-            return count > 0
+            self._has_docs = self.collection.count() > 0
         except Exception as e:
             logger.debug(f"Error checking knowledge base: {e}")
-            return False
+        return self._has_docs
     
     def get_stats(self) -> dict:
         """Get statistics about the knowledge base."""
         try:
-            count = self.vectorstore._collection.count()
+            count = self.collection.count()
             return {
                 "total_chunks": count,
                 "persist_directory": str(self.persist_directory),
@@ -256,10 +737,13 @@ class RAGManager:
             Number of documents deleted
         """
         try:
-            count = self.vectorstore._collection.count()
+            count = self.collection.count()
             # Delete collection and recreate
-            self.vectorstore._client.delete_collection(self.collection_name)
-            self._vectorstore = None  # Force re-initialization
+            self._client.delete_collection(self.collection_name)
+            self._collection = None  # Force re-initialization
+            self._generation += 1
+            self._has_docs = False
+            self._known_files = None
             print(f"Cleared {count} chunks from knowledge base")
             return count
         except Exception as e:
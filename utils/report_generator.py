@@ -1,30 +1,38 @@
 # This project was developed with assistance from AI tools.
 """
 PDF report generation for document classification results.
+
+ReportLab is imported inside the functions that use it, so importing the
+utils package (e.g. in PDF extraction workers) doesn't load it.
 """
+import functools
+import io
+import os
+from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
-
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
-from reportlab.lib.units import inch
-from reportlab.platypus import (
-    PageBreak,
-    Paragraph,
-    SimpleDocTemplate,
-    Spacer,
-    Table,
-    TableStyle,
-)
+from typing import TYPE_CHECKING
+from xml.sax.saxutils import escape
 
 from config import config
 from models import ClassifiedDocument, WorkflowError, WorkflowState
 
+if TYPE_CHECKING:
+    from reportlab.platypus import Table
 
+
+@functools.lru_cache(maxsize=1)
 def _get_styles():
-    """Get configured paragraph styles for the report."""
+    """
+    Get configured paragraph styles for the report.
+    
+    Built once and shared; ReportLab only reads styles when laying out
+    paragraphs, so the stylesheet is never mutated by a report.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    
     styles = getSampleStyleSheet()
     
     styles.add(ParagraphStyle(
@@ -72,8 +80,12 @@ def _get_styles():
     return styles
 
 
-def _create_summary_table(classification_summary: dict, styles) -> Table:
+def _create_summary_table(classification_summary: dict, styles) -> "Table":
     """Create a summary table of document categories."""
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Table, TableStyle
+    
     data = [['Category', 'Count', 'Avg Confidence']]
     
     for category, info in sorted(classification_summary.items()):
@@ -103,58 +115,49 @@ def _create_summary_table(classification_summary: dict, styles) -> Table:
     return table
 
 
-def _create_document_details(classified_docs: list[ClassifiedDocument], styles) -> list:
-    """Create detailed sections for each document."""
-    elements = []
-    by_category: dict[str, list[ClassifiedDocument]] = {}
-    for doc in classified_docs:
-        if doc.category not in by_category:
-            by_category[doc.category] = []
-        by_category[doc.category].append(doc)
+def _create_document_details(by_category: dict[str, list[ClassifiedDocument]], styles) -> list:
+    """Create detailed sections for each document, grouped by category."""
+    from reportlab.platypus import Paragraph, Spacer
     
+    elements = []
     for category in sorted(by_category.keys()):
         docs = by_category[category]
         
-        elements.append(Paragraph(f"Category: {category}", styles['SectionHeader']))
+        elements.append(Paragraph(f"Category: {escape(category)}", styles['SectionHeader']))
         elements.append(Spacer(1, 10))
         
         for doc in docs:
-            header_text = doc.document.file_name
+            header_text = escape(doc.document.file_name)
             if doc.human_reviewed:
                 header_text += " [Human Reviewed]"
             elements.append(Paragraph(header_text, styles['SubHeader']))
             
-            meta_text = f"Pages: {doc.document.page_count} | Confidence: {doc.confidence:.0%}"
-            elements.append(Paragraph(meta_text, styles['SmallText']))
-            elements.append(Spacer(1, 5))
+            # Remaining fields share one Paragraph; document text is escaped
+            # since ReportLab parses paragraph text as markup
+            fields = [
+                f'<font size="8" color="gray">Pages: {doc.document.page_count} | '
+                f'Confidence: {doc.confidence:.0%}</font>'
+            ]
             
             if doc.human_reviewed and doc.original_category:
-                elements.append(Paragraph(
-                    f"<b>Human Review:</b> Reclassified from '{doc.original_category}' to '{doc.category}'",
-                    styles['CustomBody']
-                ))
+                fields.append(
+                    f"<b>Human Review:</b> Reclassified from '{escape(doc.original_category)}' "
+                    f"to '{escape(doc.category)}'"
+                )
             
             if doc.document.summary:
-                elements.append(Paragraph(
-                    f"<b>Summary:</b> {doc.document.summary}",
-                    styles['CustomBody']
-                ))
+                fields.append(f"<b>Summary:</b> {escape(doc.document.summary)}")
             
             if doc.document.key_entities:
                 entities_text = ", ".join(doc.document.key_entities[:10])
                 if len(doc.document.key_entities) > 10:
                     entities_text += f" (+{len(doc.document.key_entities) - 10} more)"
-                elements.append(Paragraph(
-                    f"<b>Key Entities:</b> {entities_text}",
-                    styles['CustomBody']
-                ))
+                fields.append(f"<b>Key Entities:</b> {escape(entities_text)}")
             
             if doc.reasoning:
-                elements.append(Paragraph(
-                    f"<b>Classification Rationale:</b> {doc.reasoning}",
-                    styles['CustomBody']
-                ))
+                fields.append(f"<b>Classification Rationale:</b> {escape(doc.reasoning)}")
             
+            elements.append(Paragraph("<br/>".join(fields), styles['CustomBody']))
             elements.append(Spacer(1, 15))
         
         elements.append(Spacer(1, 10))
@@ -162,6 +165,18 @@ def _create_document_details(classified_docs: list[ClassifiedDocument], styles)
     return elements
 
 
+def _write_atomic(path: Path, data: bytes | memoryview):
+    """Write data to path via a temporary file and an atomic rename."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
 def generate_report(
     classified_docs: list[ClassifiedDocument],
     classification_summary: dict,
@@ -182,6 +197,9 @@ def generate_report(
     Returns:
         Path to the generated report file
     """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer
+    
     from utils.report_store import get_report_store
     
     styles = _get_styles()
@@ -190,8 +208,10 @@ def generate_report(
     report_filename = f"report_{timestamp}.pdf"
     report_path = output_path / report_filename
     
+    # Render in memory so a failed build never leaves a partial PDF on disk
+    buffer = io.BytesIO()
     doc = SimpleDocTemplate(
-        str(report_path),
+        buffer,
         pagesize=letter,
         rightMargin=72,
         leftMargin=72,
@@ -207,10 +227,28 @@ def generate_report(
     ))
     elements.append(Spacer(1, 30))
     elements.append(Paragraph("Executive Summary", styles['SectionHeader']))
+    
+    # Single pass for the section grouping, totals and stored summary
+    by_category: dict[str, list[ClassifiedDocument]] = defaultdict(list)
+    detailed_summary = defaultdict(lambda: {"count": 0, "documents": []})
+    total_pages = 0
+    human_reviewed_count = 0
+    for doc_item in classified_docs:
+        by_category[doc_item.category].append(doc_item)
+        total_pages += doc_item.document.page_count
+        if doc_item.human_reviewed:
+            human_reviewed_count += 1
+        
+        entry = detailed_summary[doc_item.category]
+        entry["count"] += 1
+        entry["documents"].append({
+            "name": doc_item.document.file_name,
+            "confidence": doc_item.confidence,
+            "human_reviewed": doc_item.human_reviewed,
+        })
+    
     total_docs = len(classified_docs)
-    total_pages = sum(d.document.page_count for d in classified_docs)
     categories_found = len(classification_summary)
-    human_reviewed_count = sum(1 for d in classified_docs if d.human_reviewed)
     
     summary_text = f"""
     This report summarizes the analysis of <b>{total_docs} PDF documents</b> 
@@ -231,24 +269,9 @@ def generate_report(
     elements.append(PageBreak())
     elements.append(Paragraph("Detailed Document Analysis", styles['CustomTitle']))
     elements.append(Spacer(1, 20))
-    elements.extend(_create_document_details(classified_docs, styles))
+    elements.extend(_create_document_details(by_category, styles))
     doc.build(elements)
-    
-    # Build detailed classification summary for storage
-    detailed_summary = {}
-    for doc_item in classified_docs:
-        cat = doc_item.category
-        if cat not in detailed_summary:
-            detailed_summary[cat] = {
-                "count": 0,
-                "documents": []
-            }
-        detailed_summary[cat]["count"] += 1
-        detailed_summary[cat]["documents"].append({
-            "name": doc_item.document.file_name,
-            "confidence": doc_item.confidence,
-            "human_reviewed": doc_item.human_reviewed,
-        })
+    _write_atomic(report_path, buffer.getbuffer())
     
     # Register report metadata for access control
     store = get_report_store()
@@ -257,7 +280,7 @@ def generate_report(
         owner_id=owner_id,
         thread_id=thread_id,
         document_count=len(classified_docs),
-        classification_summary=detailed_summary
+        classification_summary=dict(detailed_summary)
     )
     
     return str(report_path)
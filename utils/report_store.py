@@ -5,15 +5,43 @@ Report metadata storage for tracking generated reports.
 Stores ownership and metadata separately from filenames, enabling
 cleaner filenames while maintaining proper access control.
 """
+import json
 import logging
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
 from config import config
+from utils.sqlite_db import connect_app_db
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# Stay well under SQLite's bound-parameter limit (999 on older builds)
+DELETE_BATCH_SIZE = 500
+
+
+def _dump_summary(summary: dict) -> bytes | str:
+    """Serialize a classification summary compactly (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(summary)
+    return json.dumps(summary, separators=(",", ":"))
+
+
+def _load_summary(data: bytes | str | None) -> dict | None:
+    """Deserialize a stored classification summary (bytes or legacy text)."""
+    if not data:
+        return None
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 
 class ReportStore:
     """SQLite-backed storage for report metadata."""
@@ -21,12 +49,35 @@ class ReportStore:
     def __init__(self, db_path: str | None = None):
         """Initialize the report store."""
         self.db_path = db_path or config.APP_DATA_DB_PATH
+        # One persistent connection per thread (sqlite3 connections aren't
+        # safe to share across threads without serializing every call)
+        self._local = threading.local()
         self._init_db()
     
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Lazily open this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; writes use explicit transactions via _write()
+            conn = self._local.conn = connect_app_db(self.db_path)
+        return conn
+    
+    @contextmanager
+    def _write(self):
+        """Run statements in a single write transaction."""
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    
     def _init_db(self):
         """Initialize the database schema."""
-        conn = sqlite3.connect(self.db_path)
-        try:
+        with self._write() as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS reports (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -38,20 +89,19 @@ class ReportStore:
                     created_at TEXT NOT NULL
                 )
             """)
+            # Composite index serves both the owner filter and the
+            # ORDER BY created_at DESC used when listing reports
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_reports_owner 
-                ON reports(owner_id)
+                CREATE INDEX IF NOT EXISTS idx_reports_owner_created
+                ON reports(owner_id, created_at DESC)
             """)
+            conn.execute("DROP INDEX IF EXISTS idx_reports_owner")
             
             # Migration: add classification_summary column if it doesn't exist
             cursor = conn.execute("PRAGMA table_info(reports)")
             columns = [row[1] for row in cursor.fetchall()]
             if "classification_summary" not in columns:
                 conn.execute("ALTER TABLE reports ADD COLUMN classification_summary TEXT")
-            
-            conn.commit()
-        finally:
-            conn.close()
     
     def register_report(
         self,
@@ -74,20 +124,15 @@ class ReportStore:
         Returns:
             Report ID
         """
-        import json
         now = datetime.now().isoformat()
-        summary_json = json.dumps(classification_summary) if classification_summary else None
+        summary_json = _dump_summary(classification_summary) if classification_summary else None
         
-        conn = sqlite3.connect(self.db_path)
-        try:
+        with self._write() as conn:
             cursor = conn.execute("""
                 INSERT INTO reports (filename, owner_id, thread_id, document_count, classification_summary, created_at)
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (filename, owner_id, thread_id, document_count, summary_json, now))
-            conn.commit()
-            return cursor.lastrowid
-        finally:
-            conn.close()
+        return cursor.lastrowid
     
     def get_reports(self, owner_id: str | None = None) -> list[dict]:
         """
@@ -97,61 +142,54 @@ class ReportStore:
             owner_id: If provided, only return reports for this owner.
                       If None, return all reports.
         """
-        import json
-        conn = sqlite3.connect(self.db_path)
-        try:
-            if owner_id:
-                cursor = conn.execute("""
-                    SELECT id, filename, owner_id, thread_id, document_count, classification_summary, created_at
-                    FROM reports
-                    WHERE owner_id = ? OR owner_id IS NULL
-                    ORDER BY created_at DESC
-                """, (owner_id,))
-            else:
-                cursor = conn.execute("""
-                    SELECT id, filename, owner_id, thread_id, document_count, classification_summary, created_at
-                    FROM reports
-                    ORDER BY created_at DESC
-                """)
-            
-            reports = []
-            for row in cursor.fetchall():
-                summary = json.loads(row[5]) if row[5] else None
-                reports.append({
-                    "id": row[0],
-                    "filename": row[1],
-                    "owner_id": row[2],
-                    "thread_id": row[3],
-                    "document_count": row[4],
-                    "classification_summary": summary,
-                    "created_at": row[6],
-                })
-            return reports
-        finally:
-            conn.close()
+        conn = self._conn
+        if owner_id:
+            cursor = conn.execute("""
+                SELECT id, filename, owner_id, thread_id, document_count, classification_summary, created_at
+                FROM reports
+                WHERE owner_id = ? OR owner_id IS NULL
+                ORDER BY created_at DESC
+            """, (owner_id,))
+        else:
+            cursor = conn.execute("""
+                SELECT id, filename, owner_id, thread_id, document_count, classification_summary, created_at
+                FROM reports
+                ORDER BY created_at DESC
+            """)
+        
+        reports = []
+        for row in cursor.fetchall():
+            summary = _load_summary(row[5])
+            reports.append({
+                "id": row[0],
+                "filename": row[1],
+                "owner_id": row[2],
+                "thread_id": row[3],
+                "document_count": row[4],
+                "classification_summary": summary,
+                "created_at": row[6],
+            })
+        return reports
     
     def get_report_by_filename(self, filename: str) -> dict | None:
         """Get report metadata by filename."""
-        conn = sqlite3.connect(self.db_path)
-        try:
-            cursor = conn.execute("""
-                SELECT id, filename, owner_id, thread_id, document_count, created_at
-                FROM reports
-                WHERE filename = ?
-            """, (filename,))
-            row = cursor.fetchone()
-            if row:
-                return {
-                    "id": row[0],
-                    "filename": row[1],
-                    "owner_id": row[2],
-                    "thread_id": row[3],
-                    "document_count": row[4],
-                    "created_at": row[5],
-                }
-            return None
-        finally:
-            conn.close()
+        conn = self._conn
+        cursor = conn.execute("""
+            SELECT id, filename, owner_id, thread_id, document_count, created_at
+            FROM reports
+            WHERE filename = ?
+        """, (filename,))
+        row = cursor.fetchone()
+        if row:
+            return {
+                "id": row[0],
+                "filename": row[1],
+                "owner_id": row[2],
+                "thread_id": row[3],
+                "document_count": row[4],
+                "created_at": row[5],
+            }
+        return None
     
     def get_report_by_id(self, report_id: int, owner_id: str | None = None) -> dict | None:
         """
@@ -164,67 +202,59 @@ class ReportStore:
         Returns:
             Report dict if found (and owned by user if owner_id provided), None otherwise
         """
-        import json
-        conn = sqlite3.connect(self.db_path)
-        try:
-            cursor = conn.execute("""
-                SELECT id, filename, owner_id, thread_id, document_count, classification_summary, created_at
-                FROM reports
-                WHERE id = ?
-            """, (report_id,))
-            row = cursor.fetchone()
-            if not row:
-                return None
-            
-            report = {
-                "id": row[0],
-                "filename": row[1],
-                "owner_id": row[2],
-                "thread_id": row[3],
-                "document_count": row[4],
-                "classification_summary": json.loads(row[5]) if row[5] else None,
-                "created_at": row[6],
-            }
-            
-            # Verify ownership if requested
-            if owner_id and report["owner_id"] != owner_id:
-                return None
-            
-            return report
-        finally:
-            conn.close()
+        conn = self._conn
+        cursor = conn.execute("""
+            SELECT id, filename, owner_id, thread_id, document_count, classification_summary, created_at
+            FROM reports
+            WHERE id = ?
+        """, (report_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        
+        report = {
+            "id": row[0],
+            "filename": row[1],
+            "owner_id": row[2],
+            "thread_id": row[3],
+            "document_count": row[4],
+            "classification_summary": _load_summary(row[5]),
+            "created_at": row[6],
+        }
+        
+        # Verify ownership if requested
+        if owner_id and report["owner_id"] != owner_id:
+            return None
+        
+        return report
     
     def delete_report(self, filename: str):
         """Delete report metadata (does not delete the file)."""
-        conn = sqlite3.connect(self.db_path)
-        try:
+        with self._write() as conn:
             conn.execute("DELETE FROM reports WHERE filename = ?", (filename,))
-            conn.commit()
-        finally:
-            conn.close()
     
     def sync_with_filesystem(self, report_dir: Path):
         """
         Sync database with actual files on disk.
         Removes entries for files that no longer exist.
         """
-        conn = sqlite3.connect(self.db_path)
-        try:
+        # Scan the directory before taking the write lock
+        actual_files = {f.name for f in report_dir.glob("*.pdf")} if report_dir.exists() else set()
+        
+        with self._write() as conn:
             cursor = conn.execute("SELECT filename FROM reports")
             db_files = {row[0] for row in cursor.fetchall()}
             
-            actual_files = {f.name for f in report_dir.glob("*.pdf")} if report_dir.exists() else set()
-            
-            # Remove DB entries for files that don't exist
-            missing = db_files - actual_files
-            for filename in missing:
-                conn.execute("DELETE FROM reports WHERE filename = ?", (filename,))
-                logger.debug(f"Removed orphaned report entry: {filename}")
-            
-            conn.commit()
-            return len(missing)
-        finally:
-            conn.close()
+            # Remove DB entries for files that don't exist, one statement per batch
+            missing = list(db_files - actual_files)
+            for i in range(0, len(missing), DELETE_BATCH_SIZE):
+                batch = missing[i:i + DELETE_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                conn.execute(f"DELETE FROM reports WHERE filename IN ({placeholders})", batch)
+        
+        if missing:
+            logger.debug(f"Removed {len(missing)} orphaned report entries: {missing}")
+        return len(missing)
 
 
 # Singleton instance
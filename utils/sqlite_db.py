@@ -0,0 +1,37 @@
+# This project was developed with assistance from AI tools.
+"""
+Connection setup for the shared application SQLite database.
+
+Every long-lived store connection goes through connect_app_db() so the
+database runs in WAL mode (readers don't block the writer) and each
+connection gets the same cache, mmap and busy-wait settings.
+"""
+import sqlite3
+
+# Per-connection tuning, applied on open
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",  # Durable under WAL; fsyncs at checkpoints only
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",  # 64 MiB page cache
+    "PRAGMA mmap_size=268435456",  # 256 MiB memory-mapped reads
+    "PRAGMA busy_timeout=5000",  # Wait for competing writers instead of failing
+)
+
+
+def connect_app_db(db_path: str) -> sqlite3.Connection:
+    """
+    Open a tuned autocommit connection to an application database.
+    
+    Callers manage transactions explicitly (BEGIN IMMEDIATE ... COMMIT).
+    
+    Args:
+        db_path: Path to the SQLite database file
+        
+    Returns:
+        Open connection in autocommit mode
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
@@ -6,13 +6,26 @@ Two memory types:
 1. UserFactsStore: Structured facts about the user (stored in shared SQLite DB)
 2. ConversationMemory: Vector-based storage for semantic search (stored in ChromaDB)
 """
+import atexit
+import hashlib
 import json
 import logging
+import re
 import sqlite3
+import threading
+from collections import deque
+from contextlib import contextmanager
+from itertools import chain
 from datetime import datetime
 from typing import Any
 
 from config import config
+from utils.sqlite_db import connect_app_db
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +42,20 @@ class UserFactsStore:
     personalized context to the chat agent. Uses the shared app database.
     """
     
+    # Re-asserting an unchanged fact is a no-op, so it dirties no pages
+    _UPSERT_FACT = """
+        INSERT INTO user_facts (user_id, fact_type, fact_value, confidence, 
+                                source_thread_id, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, fact_type) DO UPDATE SET
+            fact_value = excluded.fact_value,
+            confidence = excluded.confidence,
+            source_thread_id = excluded.source_thread_id,
+            updated_at = excluded.updated_at
+        WHERE user_facts.fact_value IS NOT excluded.fact_value
+           OR user_facts.confidence IS NOT excluded.confidence
+    """
+    
     def __init__(self, db_path: str | None = None):
         """
         Initialize the facts store.
@@ -37,12 +64,50 @@ class UserFactsStore:
             db_path: Path to SQLite database. Defaults to shared app database.
         """
         self.db_path = db_path or config.APP_DATA_DB_PATH
+        # One persistent connection per thread, so SQLite's page cache stays
+        # warm between calls (the chat agent reads facts on every turn)
+        self._local = threading.local()
+        
+        # Formatted get_facts_summary() output per user, dropped on writes.
+        # _summary_generation stops a read racing a write from caching stale text.
+        self._summary_cache: dict[str, str] = {}
+        self._summary_generation = 0
+        self._summary_lock = threading.Lock()
         self._init_db()
     
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Lazily open this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; writes use explicit transactions via _write()
+            conn = self._local.conn = connect_app_db(self.db_path)
+        return conn
+    
+    @contextmanager
+    def _write(self):
+        """Run statements in a single write transaction."""
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    
+    def _invalidate_summary(self, user_id: str | None = None):
+        """Drop cached summaries for one user, or for everyone."""
+        with self._summary_lock:
+            self._summary_generation += 1
+            if user_id is None:
+                self._summary_cache.clear()
+            else:
+                self._summary_cache.pop(user_id, None)
+    
     def _init_db(self):
         """Initialize the database schema."""
-        conn = sqlite3.connect(self.db_path)
-        try:
+        with self._write() as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS user_facts (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -56,13 +121,14 @@ class UserFactsStore:
                     UNIQUE(user_id, fact_type)
                 )
             """)
+            # Covering index: get_facts is served from the index in updated_at order
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_user_facts_user_id 
-                ON user_facts(user_id)
+                CREATE INDEX IF NOT EXISTS idx_user_facts_user_id_updated
+                ON user_facts(user_id, updated_at DESC, fact_type, fact_value, confidence)
             """)
-            conn.commit()
-        finally:
-            conn.close()
+            conn.execute("DROP INDEX IF EXISTS idx_user_facts_user_id")
+        # Refresh planner stats once per process, only where they're stale
+        self._conn.execute("PRAGMA optimize")
     
     def set_fact(
         self,
@@ -74,154 +140,261 @@ class UserFactsStore:
     ):
         """Store or update a fact for a user."""
         now = datetime.now().isoformat()
-        conn = sqlite3.connect(self.db_path)
-        try:
-            conn.execute("""
-                INSERT INTO user_facts (user_id, fact_type, fact_value, confidence, 
-                                        source_thread_id, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(user_id, fact_type) DO UPDATE SET
-                    fact_value = excluded.fact_value,
-                    confidence = excluded.confidence,
-                    source_thread_id = excluded.source_thread_id,
-                    updated_at = excluded.updated_at
-            """, (user_id, fact_type, fact_value, confidence, source_thread_id, now, now))
-            conn.commit()
-            logger.debug(f"Stored fact for {user_id}: {fact_type}={fact_value}")
-        finally:
-            conn.close()
+        with self._write() as conn:
+            conn.execute(
+                self._UPSERT_FACT,
+                (user_id, fact_type, fact_value, confidence, source_thread_id, now, now)
+            )
+        self._invalidate_summary(user_id)
+        logger.debug(f"Stored fact for {user_id}: {fact_type}={fact_value}")
+    
+    def set_facts_bulk(
+        self,
+        user_id: str,
+        facts: list[dict],
+        source_thread_id: str | None = None
+    ) -> int:
+        """
+        Store or update several facts for a user in one transaction.
+        
+        Args:
+            user_id: User the facts belong to
+            facts: Dicts with "fact_type", "fact_value" and optional "confidence"
+            source_thread_id: Thread the facts were extracted from
+        
+        Returns:
+            Number of facts written
+        """
+        if not facts:
+            return 0
+        
+        now = datetime.now().isoformat()
+        rows = [
+            (user_id, fact["fact_type"], fact["fact_value"], fact.get("confidence", 1.0),
+             source_thread_id, now, now)
+            for fact in facts
+        ]
+        with self._write() as conn:
+            conn.executemany(self._UPSERT_FACT, rows)
+        self._invalidate_summary(user_id)
+        logger.debug(f"Stored {len(rows)} facts for {user_id}")
+        return len(rows)
     
     def get_facts(self, user_id: str) -> dict[str, Any]:
         """Get all facts for a user."""
-        conn = sqlite3.connect(self.db_path)
-        try:
-            cursor = conn.execute("""
-                SELECT fact_type, fact_value, confidence, updated_at
-                FROM user_facts
-                WHERE user_id = ?
-                ORDER BY updated_at DESC
-            """, (user_id,))
-            
-            facts = {}
-            for row in cursor.fetchall():
-                facts[row[0]] = {
-                    "value": row[1],
-                    "confidence": row[2],
-                    "updated_at": row[3]
-                }
-            return facts
-        finally:
-            conn.close()
+        cursor = self._conn.execute("""
+            SELECT fact_type, fact_value, confidence, updated_at
+            FROM user_facts
+            WHERE user_id = ?
+            ORDER BY updated_at DESC
+        """, (user_id,))
+        
+        facts = {}
+        for row in cursor.fetchall():
+            facts[row[0]] = {
+                "value": row[1],
+                "confidence": row[2],
+                "updated_at": row[3]
+            }
+        return facts
     
     def get_facts_summary(self, user_id: str) -> str:
         """Get a formatted summary of user facts for inclusion in prompts."""
-        facts = self.get_facts(user_id)
-        if not facts:
-            return ""
+        with self._summary_lock:
+            cached = self._summary_cache.get(user_id)
+            generation = self._summary_generation
+        if cached is not None:
+            return cached
         
-        lines = ["Known information about this user:"]
-        for fact_type, details in facts.items():
-            label = fact_type.replace("_", " ").title()
-            lines.append(f"- {label}: {details['value']}")
+        facts = self.get_facts(user_id)
+        if facts:
+            lines = ["Known information about this user:"]
+            for fact_type, details in facts.items():
+                label = fact_type.replace("_", " ").title()
+                lines.append(f"- {label}: {details['value']}")
+            summary = "\n".join(lines)
+        else:
+            summary = ""
         
-        return "\n".join(lines)
+        with self._summary_lock:
+            if generation == self._summary_generation:
+                self._summary_cache[user_id] = summary
+        return summary
     
     def delete_fact(self, user_id: str, fact_type: str):
         """Delete a specific fact for a user."""
-        conn = sqlite3.connect(self.db_path)
-        try:
+        with self._write() as conn:
             conn.execute(
                 "DELETE FROM user_facts WHERE user_id = ? AND fact_type = ?",
                 (user_id, fact_type)
             )
-            conn.commit()
-        finally:
-            conn.close()
+        self._invalidate_summary(user_id)
     
     def clear_user(self, user_id: str) -> int:
         """Clear all facts for a user."""
-        conn = sqlite3.connect(self.db_path)
-        try:
+        with self._write() as conn:
             cursor = conn.execute(
                 "DELETE FROM user_facts WHERE user_id = ?",
                 (user_id,)
             )
-            conn.commit()
-            return cursor.rowcount
-        finally:
-            conn.close()
+        self._invalidate_summary(user_id)
+        return cursor.rowcount
     
     def clear_all(self) -> int:
         """Clear all facts for all users."""
-        conn = sqlite3.connect(self.db_path)
-        try:
+        with self._write() as conn:
             cursor = conn.execute("DELETE FROM user_facts")
-            conn.commit()
-            return cursor.rowcount
-        finally:
-            conn.close()
+        self._invalidate_summary()
+        return cursor.rowcount
     
     def get_stats(self) -> dict:
         """Get statistics about stored facts."""
-        conn = sqlite3.connect(self.db_path)
-        try:
-            cursor = conn.execute("SELECT COUNT(DISTINCT user_id) FROM user_facts")
-            user_count = cursor.fetchone()[0]
-            cursor = conn.execute("SELECT COUNT(*) FROM user_facts")
-            fact_count = cursor.fetchone()[0]
-            return {"users": user_count, "facts": fact_count}
-        finally:
-            conn.close()
+        cursor = self._conn.execute(
+            "SELECT COUNT(DISTINCT user_id), COUNT(*) FROM user_facts"
+        )
+        user_count, fact_count = cursor.fetchone()
+        return {"users": user_count, "facts": fact_count}
 
 
 # =============================================================================
 # CONVERSATION MEMORY (ChromaDB - vector store)
 # =============================================================================
 
+def _get_embedding_device() -> str:
+    """Device for the memory embedding model (MEMORY_EMBEDDING_DEVICE, or the best available)."""
+    if config.MEMORY_EMBEDDING_DEVICE != "auto":
+        return config.MEMORY_EMBEDDING_DEVICE
+    
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return "cuda"
+        if torch.backends.mps.is_available():
+            return "mps"
+    except ImportError:
+        pass
+    return "cpu"
+
+
+def _unit_vectors(embeddings: list):
+    """L2-normalize a batch of embeddings into a float32 array."""
+    import numpy as np
+    
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
 class ConversationMemory:
     """
     Vector-based storage for past conversation turns.
     
     Enables semantic search over past conversations to recall
     specific discussions when relevant. Uses ChromaDB.
+    
+    New exchanges are buffered, then embedded and added in batches (see
+    flush()); reads flush first, so searches always see every stored exchange.
+    
+    Vectors are stored L2-normalized. New collections use cosine space;
+    collections created before that keep L2 until cleared (see search()).
     """
     
     COLLECTION_NAME = "conversation_memory"
+    EMBED_BATCH_SIZE = 64  # sentence-transformers encode batch size on flush
+    RECENT_HASHES = 256  # exact-duplicate window across all users
+    RECENT_VECTORS_PER_USER = 32  # near-duplicate window per user
+    # Per-side character cap on the text sent to the encoder (~512 tokens);
+    # the model truncates longer input anyway. The stored document is untouched.
+    EMBED_MAX_CHARS = 2000
     
     def __init__(self, persist_directory: str | None = None):
         """Initialize conversation memory."""
         self.persist_directory = persist_directory or config.CHROMA_DB_PATH
+        self._client = None
         self._collection = None
         self._embeddings = None
+        # Serializes lazy init between warmup() and the first request
+        self._init_lock = threading.Lock()
+        
+        # Pending (id, document, metadata, embed_text) rows, embedded together on flush
+        self._buffer: list[tuple[str, str, dict, str]] = []
+        self._buffer_lock = threading.Lock()
+        self._flush_timer: threading.Timer | None = None
+        atexit.register(self.flush)
+        
+        # Recently stored exchanges, so repeats ("hi", "thanks") don't keep
+        # growing the HNSW index: (user_id, text hash) pairs and unit vectors
+        self._recent_hashes: deque[tuple[str, str]] = deque(maxlen=self.RECENT_HASHES)
+        self._recent_vectors: dict[str, deque] = {}
+        
+        # Set once the collection is known to hold exchanges; only a positive
+        # answer is cached, so writes from other processes are still seen
+        self._known_nonempty = False
     
     @property
     def embeddings(self):
         """Lazy initialization of embeddings model."""
         if self._embeddings is None:
-            from langchain_huggingface import HuggingFaceEmbeddings
-            self._embeddings = HuggingFaceEmbeddings(
-                model_name=config.RAG_EMBEDDING_MODEL,
-                model_kwargs={'device': 'cpu'},
-            )
+            with self._init_lock:
+                if self._embeddings is None:
+                    from langchain_huggingface import HuggingFaceEmbeddings
+                    device = _get_embedding_device()
+                    model_kwargs = {'device': device}
+                    # The ONNX export targets CPU; GPUs keep the torch model
+                    if config.RAG_EMBEDDING_ONNX_FILE and device == "cpu":
+                        model_kwargs['backend'] = 'onnx'
+                        model_kwargs['model_kwargs'] = {'file_name': config.RAG_EMBEDDING_ONNX_FILE}
+                    logger.info(f"Conversation memory embeddings using {device}")
+                    self._embeddings = HuggingFaceEmbeddings(
+                        model_name=config.RAG_EMBEDDING_MODEL,
+                        model_kwargs=model_kwargs,
+                        encode_kwargs={'batch_size': self.EMBED_BATCH_SIZE},
+                    )
         return self._embeddings
     
     @property
     def collection(self):
         """Lazy initialization of ChromaDB collection."""
         if self._collection is None:
-            import chromadb
-            from chromadb.config import Settings
-            
-            client = chromadb.PersistentClient(
-                path=self.persist_directory,
-                settings=Settings(anonymized_telemetry=False)
-            )
-            self._collection = client.get_or_create_collection(
-                name=self.COLLECTION_NAME,
-                metadata={"description": "Chat conversation memory for semantic recall"}
-            )
+            with self._init_lock:
+                if self._collection is None:
+                    if self._client is None:
+                        from chromadb.config import Settings
+                        
+                        from utils.chroma_db import connect_chroma
+                        
+                        self._client = connect_chroma(
+                            self.persist_directory,
+                            settings=Settings(anonymized_telemetry=False)
+                        )
+                    # The HNSW space is fixed at creation, so an existing
+                    # collection is opened as-is rather than relabelled
+                    existing = {c.name for c in self._client.list_collections()}
+                    if self.COLLECTION_NAME in existing:
+                        self._collection = self._client.get_collection(self.COLLECTION_NAME)
+                    else:
+                        self._collection = self._client.get_or_create_collection(
+                            name=self.COLLECTION_NAME,
+                            metadata={
+                                "hnsw:space": "cosine",
+                                "description": "Chat conversation memory for semantic recall",
+                            }
+                        )
         return self._collection
     
+    def warmup(self):
+        """
+        Load the embedding model and collection ahead of the first request.
+        
+        Also runs one embedding so the model's first-call setup is paid here.
+        Failures are logged; the lazy properties retry on first real use.
+        """
+        try:
+            self.embeddings.embed_query("warmup")
+            _ = self.collection
+            logger.debug("Conversation memory warmed up")
+        except Exception as e:
+            logger.warning(f"Conversation memory warmup failed: {e}")
+    
     def store_exchange(
         self,
         user_id: str,
@@ -234,21 +407,160 @@ class ConversationMemory:
         timestamp = timestamp or datetime.now().isoformat()
         
         combined_text = f"User: {user_message}\nAssistant: {assistant_response}"
-        embedding = self.embeddings.embed_query(combined_text)
+        text_key = (user_id, hashlib.sha256(combined_text.encode()).hexdigest())
+        embed_text = (
+            f"User: {user_message.strip()[:self.EMBED_MAX_CHARS]}\n"
+            f"Assistant: {assistant_response.strip()[:self.EMBED_MAX_CHARS]}"
+        )
         doc_id = f"{user_id}_{thread_id}_{timestamp}"
+        metadata = {
+            "user_id": user_id,
+            "thread_id": thread_id,
+            "user_message": user_message[:500],
+            "timestamp": timestamp,
+        }
         
-        self.collection.add(
-            ids=[doc_id],
-            embeddings=[embedding],
-            documents=[combined_text],
-            metadatas=[{
-                "user_id": user_id,
-                "thread_id": thread_id,
-                "user_message": user_message[:500],
-                "timestamp": timestamp,
-            }]
-        )
-        logger.debug(f"Stored conversation exchange for {user_id} in thread {thread_id}")
+        with self._buffer_lock:
+            if text_key in self._recent_hashes:
+                logger.debug(f"Skipped duplicate conversation exchange for {user_id}")
+                return
+            self._recent_hashes.append(text_key)
+            self._buffer.append((doc_id, combined_text, metadata, embed_text))
+            flush_now = len(self._buffer) >= config.MEMORY_FLUSH_SIZE
+            if not flush_now and self._flush_timer is None:
+                self._flush_timer = threading.Timer(config.MEMORY_FLUSH_INTERVAL, self._timed_flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        
+        if flush_now:
+            self.flush()
+        logger.debug(f"Buffered conversation exchange for {user_id} in thread {thread_id}")
+    
+    def flush(self) -> int:
+        """
+        Embed buffered exchanges in one batch and write them in a single add.
+        
+        Returns:
+            Number of exchanges written
+        """
+        with self._buffer_lock:
+            pending, self._buffer = self._buffer, []
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        
+        if not pending:
+            return 0
+        
+        try:
+            vectors = _unit_vectors(self.embeddings.embed_documents([row[3] for row in pending]))
+            rows = self._drop_near_duplicates(pending, vectors)
+            if not rows:
+                return 0
+            
+            ids, documents, metadatas, vectors = (list(column) for column in zip(*rows))
+            self.collection.add(
+                ids=ids,
+                embeddings=[vector.tolist() for vector in vectors],
+                documents=documents,
+                metadatas=metadatas,
+            )
+        except Exception:
+            # Put the exchanges back, ahead of newer ones, for the next flush to retry
+            with self._buffer_lock:
+                self._buffer[:0] = pending
+            raise
+        
+        self._known_nonempty = True
+        with self._buffer_lock:
+            for metadata, vector in zip(metadatas, vectors):
+                self._recent_vectors.setdefault(
+                    metadata["user_id"], deque(maxlen=self.RECENT_VECTORS_PER_USER)
+                ).append(vector)
+        logger.debug(f"Stored {len(rows)} conversation exchange(s)")
+        
+        if config.MEMORY_MAX_EXCHANGES_PER_USER > 0:
+            # Off the caller's thread: search() flushes on the request path
+            threading.Thread(
+                target=self._prune_users,
+                args=({metadata["user_id"] for metadata in metadatas},),
+                name="conversation-memory-prune",
+                daemon=True,
+            ).start()
+        return len(rows)
+    
+    def _prune_users(self, user_ids: set[str]):
+        """Delete each user's oldest exchanges beyond MEMORY_MAX_EXCHANGES_PER_USER."""
+        limit = config.MEMORY_MAX_EXCHANGES_PER_USER
+        try:
+            for user_id in user_ids:
+                results = self.collection.get(where={"user_id": user_id}, include=["metadatas"])
+                excess = len(results["ids"]) - limit
+                if excess <= 0:
+                    continue
+                by_age = sorted(
+                    zip(results["ids"], results["metadatas"]),
+                    key=lambda item: item[1]["timestamp"],
+                )
+                self.collection.delete(ids=[doc_id for doc_id, _ in by_age[:excess]])
+                logger.debug(f"Pruned {excess} old conversation exchange(s) for {user_id}")
+        except Exception as e:
+            logger.warning(f"Failed to prune conversation memory: {e}")
+    
+    def _drop_near_duplicates(self, pending: list[tuple], vectors) -> list[tuple]:
+        """
+        Filter out exchanges nearly identical to one of the user's recent ones.
+        
+        Compares against stored exchanges and earlier rows of this batch. The
+        recent vectors themselves are only updated once the add succeeds.
+        
+        Args:
+            pending: Buffered (id, document, metadata, embed_text) rows
+            vectors: Unit-length embedding for each pending row
+        
+        Returns:
+            (id, document, metadata, unit embedding) rows to store
+        """
+        kept = []
+        batch_vectors: dict[str, list] = {}
+        with self._buffer_lock:
+            for (doc_id, document, metadata, _), unit_vector in zip(pending, vectors):
+                user_id = metadata["user_id"]
+                earlier = batch_vectors.setdefault(user_id, [])
+                candidates = chain(self._recent_vectors.get(user_id, ()), earlier)
+                similarity = max((float(unit_vector @ other) for other in candidates), default=-1.0)
+                if similarity >= config.MEMORY_DEDUP_SIMILARITY:
+                    continue
+                earlier.append(unit_vector)
+                kept.append((doc_id, document, metadata, unit_vector))
+        
+        if len(kept) < len(pending):
+            logger.debug(f"Skipped {len(pending) - len(kept)} near-duplicate exchange(s)")
+        return kept
+    
+    def _timed_flush(self):
+        """Flush from the interval timer thread, logging failures."""
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Error storing conversation memory: {e}")
+    
+    def _discard_buffered(self, user_id: str | None = None) -> int:
+        """Drop buffered exchanges and duplicate history (for one user, or all) without writing."""
+        with self._buffer_lock:
+            before = len(self._buffer)
+            if user_id is None:
+                self._buffer = []
+                self._recent_hashes.clear()
+                self._recent_vectors.clear()
+            else:
+                self._buffer = [row for row in self._buffer if row[2]["user_id"] != user_id]
+                self._recent_hashes = deque(
+                    (key for key in self._recent_hashes if key[0] != user_id),
+                    maxlen=self.RECENT_HASHES,
+                )
+                self._recent_vectors.pop(user_id, None)
+            return before - len(self._buffer)
     
     def search(
         self,
@@ -258,38 +570,43 @@ class ConversationMemory:
         include_current_thread: str | None = None
     ) -> list[dict]:
         """Search for relevant past conversations."""
-        if self.collection.count() == 0:
-            return []
+        self.flush()
+        if not self._known_nonempty:
+            if self.collection.count() == 0:
+                return []
+            self._known_nonempty = True
         
-        query_embedding = self.embeddings.embed_query(query)
+        query_embedding = _unit_vectors([self.embeddings.embed_query(query)])[0].tolist()
         where_filter = {"user_id": user_id}
+        if include_current_thread:
+            where_filter = {"$and": [
+                where_filter,
+                {"thread_id": {"$ne": include_current_thread}},
+            ]}
         
         results = self.collection.query(
             query_embeddings=[query_embedding],
-            n_results=k * 2,
+            n_results=k,
             where=where_filter,
             include=["documents", "metadatas", "distances"]
         )
         
-        exchanges = []
-        for i, doc in enumerate(results["documents"][0]):
-            metadata = results["metadatas"][0][i]
-            distance = results["distances"][0][i]
-            
-            if include_current_thread and metadata["thread_id"] == include_current_thread:
-                continue
-            
-            exchanges.append({
+        # Cosine distance is 1 - similarity; squared L2 between unit vectors
+        # (legacy collections) is 2 - 2 * similarity
+        space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+        scale = 1.0 if space == "cosine" else 0.5
+        
+        return [
+            {
                 "content": doc,
                 "thread_id": metadata["thread_id"],
                 "timestamp": metadata["timestamp"],
-                "relevance_score": 1 - distance,
-            })
-            
-            if len(exchanges) >= k:
-                break
-        
-        return exchanges
+                "relevance_score": 1 - distance * scale,
+            }
+            for doc, metadata, distance in zip(
+                results["documents"][0], results["metadatas"][0], results["distances"][0]
+            )
+        ]
     
     def search_formatted(
         self,
@@ -315,6 +632,7 @@ class ConversationMemory:
     def get_user_history_count(self, user_id: str) -> int:
         """Get the number of stored exchanges for a user."""
         try:
+            self.flush()
             results = self.collection.get(
                 where={"user_id": user_id},
                 include=[]
@@ -326,14 +644,13 @@ class ConversationMemory:
     def clear_user(self, user_id: str) -> int:
         """Clear all conversation memory for a user."""
         try:
-            results = self.collection.get(
-                where={"user_id": user_id},
-                include=[]
-            )
-            if results["ids"]:
-                self.collection.delete(ids=results["ids"])
-                return len(results["ids"])
-            return 0
+            discarded = self._discard_buffered(user_id)
+            before = self.collection.count()
+            self.collection.delete(where={"user_id": user_id})
+            deleted = before - self.collection.count()
+            if deleted:
+                self._known_nonempty = False
+            return discarded + deleted
         except Exception as e:
             logger.error(f"Error clearing user memory: {e}")
             return 0
@@ -341,11 +658,18 @@ class ConversationMemory:
     def clear_all(self) -> int:
         """Clear all conversation memory."""
         try:
+            discarded = self._discard_buffered()
             count = self.collection.count()
-            if count > 0:
-                results = self.collection.get(include=[])
-                self.collection.delete(ids=results["ids"])
-            return count
+            # Held so a concurrent first use can't open the collection
+            # being dropped and keep using it after the reset
+            with self._init_lock:
+                if count > 0:
+                    # Dropping the collection avoids listing every ID; it's
+                    # recreated empty on next use
+                    self._client.delete_collection(self.COLLECTION_NAME)
+                    self._collection = None
+                self._known_nonempty = False
+            return discarded + count
         except Exception as e:
             logger.error(f"Error clearing all memory: {e}")
             return 0
@@ -383,13 +707,7 @@ def extract_facts_from_exchange(
     try:
         response = llm.invoke(prompt)
         content = response.content if hasattr(response, 'content') else str(response)
-        
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0]
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0]
-        
-        facts = json.loads(content.strip())
+        facts = _parse_llm_json(content)
         
         if isinstance(facts, list):
             return [
@@ -403,6 +721,19 @@ def extract_facts_from_exchange(
         return []
 
 
+# First fenced block in an LLM reply, with or without a "json" tag
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+
+
+def _parse_llm_json(content: str) -> Any:
+    """Parse JSON from an LLM reply, unwrapping a markdown code fence if present."""
+    match = _FENCE_RE.search(content)
+    payload = (match.group(1) if match else content).strip()
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
 # =============================================================================
 # SINGLETON INSTANCES
 # =============================================================================
@@ -424,4 +755,10 @@ def get_conversation_memory() -> ConversationMemory:
     global _conversation_memory
     if _conversation_memory is None:
         _conversation_memory = ConversationMemory()
+        if config.MEMORY_WARMUP:
+            threading.Thread(
+                target=_conversation_memory.warmup,
+                name="conversation-memory-warmup",
+                daemon=True,
+            ).start()
     return _conversation_memory